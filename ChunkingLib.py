@@ -2,17 +2,116 @@
 # using SpaCy NLP library. It replaces identified chunks with markers (EC1, PC1, etc.)
 # RTSREC001 - Rector Ratsaka
 
-import re
-import spacy
 import csv, os 
-nlp = spacy.load("en_core_web_sm")
+import hashlib
+from bisect import bisect_left, insort
+from collections import namedtuple
 
-def mark_chunk(cq, spans, chunktype, offset, counter):
-    for (start, end) in spans:  # for each span of EC/PC candidate
-        cq = cq[:start - offset] + chunktype + str(counter) + \
-             cq[end - offset:]  # substitute that candidate with EC/PC marker
-        offset += (end - start) - len(chunktype) - len(str(counter)) 
-    return cq, offset
+MODEL_NAME = "en_core_web_sm"
+# Pipeline components the EC/PC rules never read (lemmas, entities, sentence
+# boundaries come from the parser). Excluded components are not even loaded.
+EXCLUDED_COMPONENTS = ["ner", "lemmatizer", "senter"]
+
+_nlp = None
+
+def get_nlp():
+    """
+    Return the shared spaCy pipeline, loading it on first use. Importing this
+    module is cheap; only code that actually parses pays for the model.
+    """
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load(MODEL_NAME, exclude=EXCLUDED_COMPONENTS)
+    return _nlp
+
+def __getattr__(name):
+    # `ChunkingLib.nlp` still works, it just triggers the lazy load
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Files whose content decides what template a question gets
+RULE_FILES = ["ChunkingLib.py", "Mappings.py", "patterns/mistral_rqs_patterns.csv"]
+
+def rules_version() -> str:
+    """
+    Fingerprint of the templating rules: the rule modules, the prefix
+    patterns file and the spaCy model version. Outputs stamped with another
+    fingerprint must be rebuilt from scratch.
+    """
+    # same as spacy.util.get_package_version, without importing spaCy (slow)
+    from importlib.metadata import PackageNotFoundError, version
+    h = hashlib.sha1()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in RULE_FILES:
+        path = os.path.join(base_dir, name)
+        h.update(name.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                h.update(fh.read())
+    try:
+        model_version = version(MODEL_NAME)
+    except PackageNotFoundError:
+        model_version = None
+    h.update(f"{MODEL_NAME}=={model_version}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+class TemplateBuilder:
+    """
+    Collects the accepted EC/PC spans of one question as intervals over the
+    original `text` and assembles the templated string in a single pass.
+    Offsets always refer to `text`, so no running offset has to be carried
+    while chunks are being accepted.
+    """
+
+    def __init__(self, text: str, mappings: dict | None = None):
+        self.text = text
+        self.mappings = {} if mappings is None else mappings
+        self.edits = []         # sorted, non-overlapping (start, end, replacement)
+        self._counters = {}
+
+    def next_key(self, chunktype: str) -> str:
+        self._counters[chunktype] = self._counters.get(chunktype, 0) + 1
+        return f"{chunktype}{self._counters[chunktype]}"
+
+    def overlaps(self, start: int, end: int) -> bool:
+        i = bisect_left(self.edits, (start,))
+        if i < len(self.edits) and self.edits[i][0] < end:
+            return True
+        return i > 0 and self.edits[i - 1][1] > start
+
+    def replace(self, start: int, end: int, replacement: str) -> bool:
+        """Replace text[start:end] with `replacement`; refused if it overlaps an earlier edit."""
+        if self.overlaps(start, end):
+            return False
+        insort(self.edits, (start, end, replacement))
+        return True
+
+    def mark(self, chunktype: str, spans) -> str | None:
+        """
+        Substitute every (start, end) span with the next chunktype marker
+        (e.g. a PC and its auxiliary both become "PC1"). The mapping keeps the
+        text of the last span. Returns the marker, or None if any span
+        overlaps an already accepted one.
+        """
+        if any(self.overlaps(start, end) for start, end in spans):
+            return None
+        key = self.next_key(chunktype)
+        for (start, end) in spans:
+            insort(self.edits, (start, end, key))
+            self.mappings[key] = self.text[start:end]
+        return key
+
+    def build(self) -> str:
+        parts = []
+        pos = 0
+        for start, end, replacement in self.edits:
+            parts.append(self.text[pos:start])
+            parts.append(replacement)
+            pos = end
+        parts.append(self.text[pos:])
+        return "".join(parts)
 
 def _load_prefix_patterns() -> list[str]:
     """
@@ -46,62 +145,114 @@ def _load_prefix_patterns() -> list[str]:
         "which can", "which do", "which does", "which will", "which would"
     ]
     
+    seen = set(patterns)
     for pattern in default_patterns:
-        if pattern not in patterns:
+        if pattern not in seen:
             patterns.append(pattern)
+            seen.add(pattern)
     
     return patterns
 
-_PREFIX_PATTERNS = _load_prefix_patterns()
+_PREFIX_PATTERNS = None
+_PREFIX_TRIE = None
+_TRIE_END = None  # trie key holding (pattern rank, pattern length)
+
+def _prefix_patterns() -> list[str]:
+    """Load the prefix patterns on first use."""
+    global _PREFIX_PATTERNS
+    if _PREFIX_PATTERNS is None:
+        _PREFIX_PATTERNS = _load_prefix_patterns()
+    return _PREFIX_PATTERNS
+
+def _build_prefix_trie(patterns: list[str]) -> dict:
+    """
+    Compile patterns into a word-level trie (words split on single spaces).
+    Each terminal node stores the rank of the first pattern ending there, so a
+    lookup can reproduce the "first pattern in list order wins" behaviour.
+    """
+    trie = {}
+    for rank, pat in enumerate(patterns):
+        node = trie
+        if pat:
+            for word in pat.split(" "):
+                node = node.setdefault(word, {})
+        if _TRIE_END not in node:
+            node[_TRIE_END] = (rank, len(pat))
+    return trie
+
+def _prefix_trie() -> dict:
+    global _PREFIX_TRIE
+    if _PREFIX_TRIE is None:
+        _PREFIX_TRIE = _build_prefix_trie(_prefix_patterns())
+    return _PREFIX_TRIE
 
 def _prefix_end_index(question: str) -> int | None:
-    """Return the character index *after* a matched prefix or None."""
+    """
+    Return the character index *after* a matched prefix or None.
+    A pattern matches when the question starts with it followed by a space,
+    or equals it; if several match, the earliest one in the pattern list wins.
+    """
     q_lc = question.strip().lower()
-    for pat in _PREFIX_PATTERNS:
-        if q_lc.startswith(pat + " "):  # Ensure we match complete words with space after
-            return len(pat)
-        elif q_lc.startswith(pat) and len(q_lc) == len(pat):  # Exact match for single word
-            return len(pat)
-    return None
+    node = _prefix_trie()
+    best = node.get(_TRIE_END) if not q_lc else None
+    if q_lc:
+        for word in q_lc.split(" "):
+            node = node.get(word)
+            if node is None:
+                break
+            hit = node.get(_TRIE_END)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+    return best[1] if best is not None else None
+
+# Question starters that are never chunk-replaced: a single word at position 0,
+# or a two-word opening (positions 0 and 1)
+_QUESTION_STARTERS = frozenset([
+    "can", "do", "does", "did", "will", "would", "could", "should",
+    "is", "are", "was", "were", "has", "have", "had",
+    "what", "which", "when", "where", "who", "whom", "whose", "why", "how"
+])
+_TWO_WORD_STARTERS = frozenset([
+    ("how", "can"), ("how", "do"), ("how", "does"), ("how", "will"), ("how", "would"),
+    ("how", "should"), ("how", "could"), ("how", "might"), ("how", "may"),
+    ("what", "can"), ("what", "do"), ("what", "does"), ("what", "will"), ("what", "would"),
+    ("when", "can"), ("when", "do"), ("when", "does"), ("when", "will"), ("when", "would"),
+    ("where", "can"), ("where", "do"), ("where", "does"), ("where", "will"), ("where", "would"),
+    ("why", "can"), ("why", "do"), ("why", "does"), ("why", "will"), ("why", "would"),
+    ("which", "can"), ("which", "do"), ("which", "does"), ("which", "will"), ("which", "would")
+])
+
+def _protected_token_ids(words) -> frozenset[int]:
+    """
+    Return the positions of tokens that are part of a question starter and
+    must be preserved. `words` are the lower-cased leading tokens of the
+    question; only the first two are inspected. Computed once per parsed
+    question, then each protection check is a set lookup.
+    """
+    words = list(words[:2])
+    if len(words) > 1 and (words[0], words[1]) in _TWO_WORD_STARTERS:
+        return frozenset((0, 1))
+    if words and words[0] in _QUESTION_STARTERS:
+        return frozenset((0,))
+    return frozenset()
+
+def _token_range(starts, begin, end) -> range:
+    """
+    Indices of the tokens whose start offset lies in [begin, end), given the
+    sorted token start offsets `starts` (built once per parsed question).
+    """
+    return range(bisect_left(starts, begin), bisect_left(starts, end))
+
+def _doc_protected_token_ids(doc) -> frozenset[int]:
+    return _protected_token_ids([t.text.lower() for t in doc[:2]])
+
+def _is_question_starter(token_pos, words):
+    """Check if the word at `token_pos` is part of a question starter that should be preserved"""
+    return token_pos in _protected_token_ids(words)
 
 def _is_question_starter_token(token, doc):
     """Check if a token is part of a question starter that should be preserved"""
-    # Get position of token in sentence
-    token_pos = token.i
-    
-    # Check if this token starts a common question pattern
-    question_starters = ["can", "do", "does", "did", "will", "would", "could", "should", 
-                        "is", "are", "was", "were", "has", "have", "had",
-                        "what", "which", "when", "where", "who", "whom", "whose", "why", "how"]
-    
-    if token_pos == 0 and token.text.lower() in question_starters:
-        return True
-    
-    # Check for two-word question starters like "how can", "what do", etc.
-    if token_pos <= 1:
-        two_word_patterns = [
-            ["how", "can"], ["how", "do"], ["how", "does"], ["how", "will"], ["how", "would"],
-            ["how", "should"], ["how", "could"], ["how", "might"], ["how", "may"],
-            ["what", "can"], ["what", "do"], ["what", "does"], ["what", "will"], ["what", "would"],
-            ["when", "can"], ["when", "do"], ["when", "does"], ["when", "will"], ["when", "would"],
-            ["where", "can"], ["where", "do"], ["where", "does"], ["where", "will"], ["where", "would"],
-            ["why", "can"], ["why", "do"], ["why", "does"], ["why", "will"], ["why", "would"],
-            ["which", "can"], ["which", "do"], ["which", "does"], ["which", "will"], ["which", "would"]
-        ]
-        
-        for pattern in two_word_patterns:
-            if (len(doc) > 1 and token_pos < len(pattern) and
-                token_pos < len(doc) and doc[token_pos].text.lower() == pattern[token_pos]):
-                # Check if the full pattern matches
-                pattern_matches = True
-                for i, word in enumerate(pattern):
-                    if i >= len(doc) or doc[i].text.lower() != word:
-                        pattern_matches = False
-                        break
-                if pattern_matches:
-                    return True
-    
-    return False
+    return token.i in _doc_protected_token_ids(doc)
 
 def extract_EC_chunks(cq):
     """
@@ -129,8 +280,10 @@ def extract_EC_chunks(cq):
 
         return (chunk.start_char, chunk.end_char) if len(chunk) > 0 else None
 
-    doc = nlp(cq)
+    doc = get_nlp()(cq)
     prefix_end = _prefix_end_index(cq)
+    protected = _doc_protected_token_ids(doc)
+    starts = [token.idx for token in doc]
 
     #  things classified as ECs which shouldn't be interpreted that way
     rejecting_ec = ["does", "do", "can", "could", "will", "would", "should", "shall", "may", "might",
@@ -142,8 +295,7 @@ def extract_EC_chunks(cq):
                     "is", "are", "was", "were", "have", "has", "had", "been", "being", "be",
                     "how can", "what can", "when can", "where can", "why can", "which can"]
 
-    counter = 1
-    offset = 0
+    builder = TemplateBuilder(cq)
 
     # we decided to treat qualities defined as adjectives in: How + Quality(adjective) + Verb as EC
     if (len(doc) > 2 and
@@ -154,8 +306,7 @@ def extract_EC_chunks(cq):
         start = doc[1].idx
         end = start + len(doc[1])
 
-        cq, offset = mark_chunk(cq, [(start, end)], "EC", offset, counter)
-        counter += 1
+        builder.mark("EC", [(start, end)])
 
     for chunk in doc.noun_chunks:
         span_result = _get_EC_span_reject_wh_starters(chunk)
@@ -169,7 +320,7 @@ def extract_EC_chunks(cq):
         if prefix_end is not None and start < prefix_end:
             continue
 
-        ec = cq[start - offset:end - offset]
+        ec = cq[start:end]
 
         if (ec.lower().strip() in rejecting_ec or
             ec.strip() == "" or
@@ -177,8 +328,8 @@ def extract_EC_chunks(cq):
             continue
 
         # Check if any token in this chunk is a question starter that should be preserved
-        chunk_tokens = [token for token in doc if token.idx >= start and token.idx < end]
-        if any(_is_question_starter_token(token, doc) for token in chunk_tokens):
+        chunk_tokens = _token_range(starts, start, end)
+        if any(i in protected for i in chunk_tokens):
             continue
 
         # Additional check for single auxiliary verbs at start of question
@@ -188,35 +339,48 @@ def extract_EC_chunks(cq):
             continue
 
         if "the thing" in ec and end - start > len("the thing"):
-            cq = cq[:start - offset] + "EC" + str(counter) + \
-                 " EC" + str(counter + 1) + cq[end - offset:]
-            counter += 2
-            offset += (end - start) - 7
+            if not builder.overlaps(start, end):
+                builder.replace(start, end, builder.next_key("EC") + " " + builder.next_key("EC"))
         else:
-            cq, offset = mark_chunk(cq, [(start, end)], "EC", offset, counter)
-            counter += 1
+            builder.mark("EC", [(start, end)])
 
     # Handle end-of-sentence adjectives/adverbs
     try:
         if len(doc) >= 2:
             if (doc[-2].pos_ == 'VERB' and len(doc) >= 3 and doc[-3].text in ['are', 'is', 'were', 'was'] and doc[-1].text == '?') or (doc[-2].pos_ in ['ADJ', 'ADV'] and doc[-1].text == '?'):
                 if (doc[-2].text.lower() not in rejecting_ec and
-                    not _is_question_starter_token(doc[-2], doc)):
+                    doc[-2].i not in protected):
                     start = doc[-2].idx
                     end = start + len(doc[-2])
 
-                    cq, offset = mark_chunk(
-                        cq, [(start, end)], "EC", offset, counter)
-                    counter += 1
+                    builder.mark("EC", [(start, end)])
     except Exception as e:
         print('Error processing. Doc = ', doc, 'Error:', e)
 
-    return cq
+    return builder.build()
 
-def get_PCs_as_spans(cq):
-    def _is_auxilary(token, chunk_token_ids):
+# Minimal token view used by the PC rules. `head` is the index of the head unit
+# (or None), offsets are character offsets in the string being templated.
+PCUnit = namedtuple("PCUnit", ["text", "pos", "dep", "head", "start", "end"])
+
+def _pc_units_from_doc(doc):
+    return [PCUnit(t.text, t.pos_, t.dep_, t.head.i, t.idx, t.idx + len(t))
+            for t in doc]
+
+def _get_PC_spans_from_units(units):
+    """
+        PC rules over a sequence of PCUnits. Returns (begin, end, aux) spans
+        where aux is the index of the auxiliary unit or None.
+    """
+    # head unit -> its auxiliary children, in document order
+    aux_children = {}
+    for i, unit in enumerate(units):
+        if unit.dep == 'aux' and unit.head is not None:
+            aux_children.setdefault(unit.head, []).append(i)
+
+    def _get_aux(chunk_token_ids):
         """
-            Check if given token is an auxiliary verb of detected PC.
+            Find the auxiliary verb of detected PC (the last one in the question).
             The auxiliary verb can be in a different place than the main part
             of the PC, so pos-tag-sequence based rules don't work here.
             For example in "What system does Weka require?" - the main part
@@ -224,71 +388,86 @@ def get_PCs_as_spans(cq):
             from the main part by 'Weka' noun. Thus dependency tree is used
             to identify auxiliaries.
         """
-        if (token.head.i in chunk_token_ids and
-                token.dep_ == 'aux' and
-                token.i not in chunk_token_ids):
-            return True
-        else:
-            return False
-
-    def _get_span(group, doc):
-        id_tags = group.split(",")
-        ids = [int(id_tag.split("::")[0]) for id_tag in id_tags]
         aux = None
-        for token in doc:
-            if _is_auxilary(token, ids):
-                aux = token
+        for head in chunk_token_ids:
+            for i in aux_children.get(head, ()):
+                if i not in chunk_token_ids and (aux is None or i > aux):
+                    aux = i
+        return aux
 
-        return (doc[ids[0]].idx, doc[ids[-1]].idx + len(doc[ids[-1]]),
-                aux)
+    def _get_span(first, last):
+        ids = range(first, last + 1)
+        return (units[first].start, units[last].end, _get_aux(ids))
 
-    def _reject_subspans(spans):
-        """
-            Given list of (chunk begin index, chunk end index) spans,
-            return only those spans that aren't sub-spans of any other span.
-            For instance form list [(1,10), (2,5)], the second span
-            will be rejected because it is a subspan of the first one.
-        """
-        filtered = []
-        for i, span in enumerate(spans):
-            subspan = False
-            for j, other in enumerate(spans):
-                if i == j:
-                    continue
-
-                if span[0] >= other[0] and span[1] <= other[1]:
-                    subspan = True
-                    break
-            if subspan is False:
-                filtered.append(span)
-        return filtered
-
-    doc = nlp(cq)
+    spans = [_get_span(first, last)
+             for first, last in _match_PC_token_groups([u.pos for u in units])]
+    return _reject_subspans(spans)
 
+def _match_PC_token_groups(pos_tags):
     """
-        Transform CQ into a form of POS-tags with token sequence identifier.
-        Each token is described with "{ID}::{POS_TAG}".
-        Tokens are separated with ","
-        Having that form, we can extract longest sequences of expected pos-tags
-        using regexes. The extracted parts can be explored to collect identifiers
-        of tokens, so we know where they are located in text.
-        Ex: "Kate owns a cat" should be translated into: "1::NOUN,2::VERB,3::DET,4::NOUN"
+        Rules describing PCs, matched directly on the POS tag sequence.
+        Returns (first token id, last token id) groups in rule order.
+        Every rule starts at a maximal run of PART/VERB tokens:
+          1. the run up to its last VERB                  (PART|VERB)* VERB
+          2. the run, then ADJ/ADV tokens, then an ADP    (PART|VERB)+ (ADJ|ADV)+ ADP
+          3. the run directly followed by an ADP          (PART|VERB)+ ADP
+        This gives exactly the leftmost-longest, non-overlapping matches that
+        regexes over a "{ID}::{POS_TAG}," serialization of the question used
+        to produce, without building or re-parsing that string.
     """
-    pos_text = ",".join(
-        ["{id}::{pos}".format(id=id, pos=t.pos_) for id, t in enumerate(doc)])
-
-    regexes = [  # rules describing PCs
-        r"([0-9]+::(PART|VERB),?)*([0-9]+::VERB)",
-        r"([0-9]+::(PART|VERB),?)+([0-9]+::AD(J|V),)+([0-9]+::ADP)",
-        r"([0-9]+::(PART|VERB),?)+([0-9]+::ADP)",
-    ]
+    n = len(pos_tags)
+    runs = []  # (run start, run end, last VERB in run or None)
+    i = 0
+    while i < n:
+        if pos_tags[i] in ("PART", "VERB"):
+            start, last_verb = i, None
+            while i < n and pos_tags[i] in ("PART", "VERB"):
+                if pos_tags[i] == "VERB":
+                    last_verb = i
+                i += 1
+            runs.append((start, i - 1, last_verb))
+        else:
+            i += 1
+
+    verb_groups, adj_adp_groups, adp_groups = [], [], []
+    for start, end, last_verb in runs:
+        if last_verb is not None:
+            verb_groups.append((start, last_verb))
+        j = end + 1
+        while j < n and pos_tags[j] in ("ADJ", "ADV"):
+            j += 1
+        if j > end + 1 and j < n and pos_tags[j] == "ADP":
+            adj_adp_groups.append((start, j))
+        if end + 1 < n and pos_tags[end + 1] == "ADP":
+            adp_groups.append((start, end + 1))
+    return verb_groups + adj_adp_groups + adp_groups
+
+def _reject_subspans(spans):
+    """
+        Given list of (chunk begin index, chunk end index) spans,
+        return only those spans that aren't sub-spans of any other span.
+        For instance form list [(1,10), (2,5)], the second span
+        will be rejected because it is a subspan of the first one.
+        Identical spans reject each other. Sort-and-sweep: after sorting by
+        (begin, -end), a span is covered iff an earlier one reaches its end.
+    """
+    order = sorted(range(len(spans)), key=lambda i: (spans[i][0], -spans[i][1]))
+    keep = [True] * len(spans)
+    max_end = None
+    for k, i in enumerate(order):
+        begin, end = spans[i][0], spans[i][1]
+        if max_end is not None and max_end >= end:
+            keep[i] = False
+        elif k + 1 < len(order) and spans[order[k + 1]][:2] == (begin, end):
+            keep[i] = False  # duplicated span
+        if max_end is None or end > max_end:
+            max_end = end
+    return [span for i, span in enumerate(spans) if keep[i]]
 
-    spans = []
-    for regex in regexes:
-        for m in re.finditer(regex, pos_text):
-            spans.append(_get_span(m.group(), doc))
-    spans = _reject_subspans(spans)
-    return spans
+def get_PCs_as_spans(cq):
+    doc = get_nlp()(cq)
+    return [(begin, end, doc[aux] if aux is not None else None)
+            for begin, end, aux in _get_PC_spans_from_units(_pc_units_from_doc(doc))]
 
 def extract_PC_chunks(cq):
     rejecting_pc = ['is', 'are', 'was', 'were', 'do', 'does', 'did', 
@@ -297,18 +476,19 @@ def extract_PC_chunks(cq):
                     'categorise', 'regarding', 'is of', 'are of', 'are in', 
                     'given', 'is there', 'are there', 'was there', 'were there']
 
-    doc = nlp(cq)
+    doc = get_nlp()(cq)
     prefix_end = _prefix_end_index(cq)
+    protected = _doc_protected_token_ids(doc)
+    starts = [token.idx for token in doc]
 
-    offset = 0
-    counter = 1
+    builder = TemplateBuilder(cq)
 
-    for begin, end, aux in get_PCs_as_spans(cq):
+    for begin, end, aux in _get_PC_spans_from_units(_pc_units_from_doc(doc)):
         # Skip if this PC chunk is within the protected prefix
         if prefix_end is not None and begin < prefix_end:
             continue
             
-        pc_text = cq[begin - offset:end - offset]
+        pc_text = cq[begin:end]
         
         if (pc_text.lower().strip() in rejecting_pc or
             pc_text.strip() == "" or
@@ -316,27 +496,30 @@ def extract_PC_chunks(cq):
             continue
 
         # Check if any token in this PC chunk is a question starter
-        pc_tokens = [token for token in doc if token.idx >= begin and token.idx < end]
-        if any(_is_question_starter_token(token, doc) for token in pc_tokens):
+        pc_tokens = _token_range(starts, begin, end)
+        if any(i in protected for i in pc_tokens):
             continue
 
         spans = [(begin, end)]
 
         # Handle auxiliary verbs, but check if they're question starters
-        if aux and aux.text.lower() not in rejecting_pc:
-            if not _is_question_starter_token(aux, doc):
-                spans.insert(0, (aux.idx, aux.idx + len(aux)))
+        if aux is not None and doc[aux].text.lower() not in rejecting_pc:
+            if aux not in protected:
+                spans.insert(0, (doc[aux].idx, doc[aux].idx + len(doc[aux])))
 
-        cq, offset = mark_chunk(cq, spans, "PC", offset, counter)
-        counter += 1
+        builder.mark("PC", spans)
 
-    return cq
+    return builder.build()
 
 # Re-export mapping helpers 
 try:
     from Mappings import (
         extract_EC_chunks_with_mapping,
         extract_PC_chunks_with_mapping,
+        extract_template_with_mapping,
+        template_doc_with_mapping,
+        extract_templates_batch,
+        TemplatePool,
     )
 except Exception as _err: 
     pass
\ No newline at end of file
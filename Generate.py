@@ -1,21 +1,56 @@
 # Generate CNL templates and structured EC/PC mappings from research questions (RQs)
-# Usage: python3 Generate.py <input_rqs.csv>
+# Usage: python3 Generate.py <input_rqs.csv> [more.csv | 'research_questions/*.csv' ...]
 # RTSREC001 - Rector Ratsaka
 
 import pandas as pd
 import argparse
+import csv
+import glob
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
 
-from ChunkingLib import extract_EC_chunks, extract_PC_chunks
+from ChunkingLib import extract_EC_chunks, extract_PC_chunks, MODEL_NAME, rules_version
 from ChunkingLib import (
     extract_EC_chunks_with_mapping,  
     extract_PC_chunks_with_mapping,
+    extract_template_with_mapping,
+    extract_templates_batch,
+    TemplatePool,
 )
+from Mappings import OUTPUT_COLS  # columns of the final output CSV
+from ParseCache import ParseCache
 
 # command line args
 parser = argparse.ArgumentParser(description="Generate CNL templates and structured EC/PC mappings from research questions (RQs).")
-parser.add_argument("input_rqs", type=str, help="Input CSV file with research questions.")
+parser.add_argument("input_rqs", type=str, nargs="+",
+                    help="Input CSV file(s) with research questions; quoted globs are expanded.")
+parser.add_argument("--batch-size", type=int, default=256, help="Questions per spaCy nlp.pipe batch.")
+parser.add_argument("--n-process", type=int, default=1, help="Number of spaCy worker processes.")
+parser.add_argument("--parse-cache", type=str, default=None, help="Directory for cached parses (opt-in).")
+parser.add_argument("--parse-cache-max-mb", type=int, default=512, help="Size limit of the parse cache in MB.")
+parser.add_argument("--output", type=str, default=None,
+                    help="Output CSV for a single input (default: cnl_output/mistral_test.csv).")
+parser.add_argument("--output-dir", type=str, default=None,
+                    help="With several inputs, write <input stem>.csv here (default: cnl_output).")
+parser.add_argument("--workers", type=int, default=None,
+                    help="Size of the shared worker pool used for several inputs (default: CPU count).")
+parser.add_argument("--jobs", type=int, default=2,
+                    help="Input files in flight at once on the shared pool.")
+parser.add_argument("--incremental", action="store_true",
+                    help="Reuse rows of an existing output and only template new or changed questions.")
+parser.add_argument("--stream", action="store_true",
+                    help="Read, template and write in chunks with flat memory use (for very large inputs).")
+parser.add_argument("--chunksize", type=int, default=10000, help="Questions per chunk in --stream mode.")
+parser.add_argument("--sort", action="store_true",
+                    help="In --stream mode, external-sort the output shortest template first.")
 args = parser.parse_args()
 input_rqs = args.input_rqs
 
@@ -30,18 +65,29 @@ class CNLTemplateGenerator:
         """
         Returns (templated_question, mapping_dict)
         where mapping_dict has keys EC1 … ECn, PC1 … PCm.
+        The question is parsed once; EC and PC rules share the same Doc.
+        """
+        return extract_template_with_mapping(question)
+
+    def extract_template_with_mapping_two_pass(self, question: str):
+        """
+        Previous behaviour: the EC-marked string is re-parsed for the PC pass.
         """
         cq_with_ec, map_dict = extract_EC_chunks_with_mapping(question)
         templated, map_dict  = extract_PC_chunks_with_mapping(cq_with_ec, map_dict)
         return templated, map_dict
 
-
-# Columns for final output CSV
-OUTPUT_COLS = [
-    "research_question", "templated_question",
-    "EC1", "EC2", "EC3", "EC4", "EC5",
-    "PC1", "PC2"
-]
+    def extract_templates_batch(self, questions, batch_size: int = 256, n_process: int = 1,
+                                cache: ParseCache | None = None, pool: TemplatePool | None = None):
+        """
+        Yields (templated_question, mapping_dict) per question, in input order,
+        parsing the questions in batches (optionally across processes, or on
+        an already running TemplatePool).
+        """
+        if pool is not None:
+            return pool.extract_templates(questions)
+        return extract_templates_batch(questions, batch_size=batch_size,
+                                       n_process=n_process, cache=cache)
 
 
 def create_output_directory() -> Path:
@@ -50,48 +96,334 @@ def create_output_directory() -> Path:
     return out_dir
 
 
-def process_csv_file(file_path: Path) -> None:
-    print(f"\nProcessing: {file_path} ***")
-    df = pd.read_csv(file_path)
-
-    if "research_question" not in df.columns:
-        print("missing ‘research_question’ column")
-        return
-
-    df = df[["research_question"]].dropna().drop_duplicates()
-
+def template_questions(questions: pd.Series, batch_size: int = 256, n_process: int = 1,
+                       cache: ParseCache | None = None,
+                       pool: TemplatePool | None = None) -> pd.DataFrame:
+    """Template `questions` and return OUTPUT_COLS rows (same index, unsorted)."""
     gen = CNLTemplateGenerator()
+    df = questions.to_frame("research_question")
 
-    # Apply extraction with mapping
-    results = df["research_question"].apply(gen.extract_template_with_mapping)
+    # Apply extraction with mapping (batched parsing, input order is kept)
+    results = pd.Series(
+        list(gen.extract_templates_batch(questions,
+                                         batch_size=batch_size,
+                                         n_process=n_process,
+                                         cache=cache,
+                                         pool=pool)),
+        index=questions.index,
+        dtype=object
+    )
 
     df["templated_question"] = results.apply(lambda x: x[0])
     df["mapping_dict"]       = results.apply(lambda x: x[1])
 
-    df = (df.assign(template_len=df["templated_question"].str.len())
-             .sort_values("template_len", ascending=True)
-             .drop(columns="template_len"))
-
     # Expand EC / PC columns (pad with “” if missing)
     for i in range(1, 6):
         df[f"EC{i}"] = df["mapping_dict"].apply(lambda d: d.get(f"EC{i}", ""))
     for i in range(1, 3):
         df[f"PC{i}"] = df["mapping_dict"].apply(lambda d: d.get(f"PC{i}", ""))
 
-    df = df[OUTPUT_COLS]
+    return df[OUTPUT_COLS]
+
+
+def sort_by_template_length(df: pd.DataFrame) -> pd.DataFrame:
+    # stable, so equal-length templates keep input order (the default quicksort
+    # used before left ties in an arbitrary order; --stream --sort and
+    # --incremental both rely on reproducing this order exactly)
+    return (df.assign(template_len=df["templated_question"].str.len())
+              .sort_values("template_len", ascending=True, kind="stable")
+              .drop(columns="template_len"))
 
-    out_path = create_output_directory() / "mistral_test.csv"
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _row_hash(row) -> str:
+    return _sha1("\x1f".join(str(v) for v in row))
+
+
+def manifest_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".manifest.json")
+
+
+def load_previous_output(out_path: Path, rules: str) -> pd.DataFrame | None:
+    """
+    Rows of an earlier run that can be reused: the output and its manifest
+    must exist, carry the current rules version, and each row must still hash
+    to what was written. Returns None if a full rebuild is needed.
+    """
+    man_path = manifest_path(out_path)
+    if not out_path.exists() or not man_path.exists():
+        return None
+    with open(man_path, encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest.get("rules_version") != rules:
+        print(f"rules changed ({manifest.get('rules_version')} -> {rules}), full rebuild")
+        return None
+
+    prev = pd.read_csv(out_path, dtype=str, keep_default_na=False)
+    if list(prev.columns) != OUTPUT_COLS:
+        return None
+    rows = manifest.get("rows", {})
+    valid = [rows.get(_sha1(q)) == _row_hash(r)
+             for q, r in zip(prev["research_question"], prev.itertuples(index=False))]
+    return prev[valid].drop_duplicates("research_question")
+
+
+def write_output(df: pd.DataFrame, out_path: Path, rules: str | None = None) -> None:
+    """
+    Write the output CSV, and with a `rules` version (--incremental) its
+    manifest. Without one, a manifest left by an earlier incremental run is
+    removed, since it no longer describes the file.
+    """
     df.to_csv(out_path, index=False, encoding="utf-8")
+    if rules is None:
+        manifest_path(out_path).unlink(missing_ok=True)
+        return
+    strings = df.astype(str)
+    manifest = {
+        "rules_version": rules,
+        "rows": {_sha1(q): _row_hash(r)
+                 for q, r in zip(strings["research_question"], strings.itertuples(index=False))},
+    }
+    with open(manifest_path(out_path), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+
+
+def process_csv_file(file_path: Path, batch_size: int = 256, n_process: int = 1,
+                     cache: ParseCache | None = None, out_path: Path | None = None,
+                     incremental: bool = False, pool: TemplatePool | None = None) -> None:
+    print(f"\nProcessing: {file_path} ***")
+    df = pd.read_csv(file_path)
+
+    if "research_question" not in df.columns:
+        print("missing ‘research_question’ column")
+        return
+
+    df = df[["research_question"]].dropna().drop_duplicates()
+    questions = df["research_question"].astype(str)
+
+    if out_path is None:
+        out_path = create_output_directory() / "mistral_test.csv"
+    rules = rules_version() if incremental else None
+
+    prev = load_previous_output(out_path, rules) if incremental else None
+    if prev is None:
+        out = template_questions(questions, batch_size, n_process, cache, pool)
+    else:
+        # only template questions that are new (or whose previous row changed);
+        # a question is identified by its text, so an edited question is a new one
+        prev = prev.set_index("research_question")
+        todo = questions[~questions.isin(prev.index)]
+        print(f"incremental: {len(questions) - len(todo)} reused, {len(todo)} to template")
+        kept = prev[prev.index.isin(questions)]
+        if not todo.empty:  # nothing new: the spaCy model is never loaded
+            kept = pd.concat([kept, template_questions(todo, batch_size, n_process, cache, pool)
+                                    .set_index("research_question")])
+        # rebuild in input order so the result equals a full run
+        out = kept.loc[questions.values].reset_index()
+
+    out = sort_by_template_length(out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_output(out, out_path, rules)
     print(f"saved to {out_path}")
 
+    if cache is not None:
+        cache.evict()
+        print(cache.report())
+
+
+def process_csv_stream(file_path: Path, out_path: Path | None = None, chunksize: int = 10000,
+                       sort: bool = False, batch_size: int = 256, n_process: int = 1,
+                       cache: ParseCache | None = None,
+                       pool: TemplatePool | None = None) -> None:
+    """
+    Bounded-memory variant of process_csv_file for very large inputs: read
+    `chunksize` questions at a time, template them and append the rows to the
+    output straight away. With `sort`, each chunk is written as a sorted run
+    to a temporary file and the runs are merged into the shortest-template-first
+    order (the same order process_csv_file produces). Duplicate questions are
+    dropped via 64-bit hashes, the only state that grows with the input.
+    No incremental manifest is written in this mode.
+    """
+    print(f"\nStreaming: {file_path} ***")
+    # check the header before the previous output is truncated
+    if "research_question" not in pd.read_csv(file_path, nrows=0).columns:
+        print("missing ‘research_question’ column")
+        return
+    if out_path is None:
+        out_path = create_output_directory() / "mistral_test.csv"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path(out_path).unlink(missing_ok=True)
+
+    seen = set()
+    runs = []
+    seq = 0
+    total = 0
+    run_dir = tempfile.mkdtemp(prefix="cnl_runs_", dir=out_path.parent) if sort else None
+    try:
+        with open(out_path, "w", newline="", encoding="utf-8") as out_fh:
+            if not sort:
+                csv.writer(out_fh, lineterminator="\n").writerow(OUTPUT_COLS)
+
+            for chunk in pd.read_csv(file_path, chunksize=chunksize):
+                questions = chunk["research_question"].dropna().drop_duplicates().astype(str)
+                keys = questions.map(lambda q: int.from_bytes(
+                    hashlib.blake2b(q.encode("utf-8"), digest_size=8).digest(), "big"))
+                fresh = ~keys.isin(seen)
+                questions = questions[fresh]
+                seen.update(keys[fresh])
+                if questions.empty:
+                    continue
+
+                rows = template_questions(questions, batch_size, n_process, cache, pool)
+                total += len(rows)
+                if not sort:
+                    rows.to_csv(out_fh, header=False, index=False)
+                    continue
+
+                # sorted run; "seq" keeps ties in input order across runs
+                rows = rows.assign(seq=range(seq, seq + len(rows)))
+                seq += len(rows)
+                run_path = Path(run_dir) / f"run_{len(runs):05d}.csv"
+                sort_by_template_length(rows).to_csv(run_path, header=False, index=False)
+                runs.append(run_path)
+                print(f"  {total} questions templated")
+
+            if sort:
+                merge_sorted_runs(runs, out_fh)
+    finally:
+        if run_dir is not None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    print(f"saved {total} rows to {out_path}")
+    if cache is not None:
+        cache.evict()
+        print(cache.report())
+
+
+def merge_sorted_runs(runs: list[Path], out_fh) -> None:
+    """k-way merge of run files (OUTPUT_COLS + seq) by (template length, seq)."""
+    writer = csv.writer(out_fh, lineterminator="\n")
+    writer.writerow(OUTPUT_COLS)
+    tq = OUTPUT_COLS.index("templated_question")
+    files = [open(path, newline="", encoding="utf-8") for path in runs]
+    try:
+        readers = [csv.reader(fh) for fh in files]
+        for row in heapq.merge(*readers, key=lambda r: (len(r[tq]), int(r[-1]))):
+            writer.writerow(row[:-1])
+    finally:
+        for fh in files:
+            fh.close()
+
+
+def peak_rss_mb() -> tuple[float, float] | None:
+    """
+    (parent, largest child) peak RSS in MB. They are peaks of different
+    processes at different times, so they are reported apart, never summed;
+    the child figure only covers worker processes that have already exited.
+    """
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def expand_inputs(patterns: list[str]) -> list[Path]:
+    """Expand glob patterns (shells on Windows don't) and drop repeated files."""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"No files match: {pattern}")
+        files.extend(Path(m) for m in matches)
+    return list(dict.fromkeys(files))
+
+
+def output_paths(inputs: list[Path], output_dir: Path) -> dict[Path, Path] | None:
+    """One output per input, <output_dir>/<input stem>.csv; None if two stems collide."""
+    outputs = {src: output_dir / f"{src.stem}.csv" for src in inputs}
+    if len(set(outputs.values())) != len(outputs):
+        print("inputs with the same file name would overwrite each other's output")
+        return None
+    return outputs
+
+
+def process_one(src: Path, out_path: Path | None, pool: TemplatePool | None = None,
+                cache: ParseCache | None = None) -> None:
+    if args.stream:
+        process_csv_stream(src, out_path=out_path, chunksize=args.chunksize, sort=args.sort,
+                           batch_size=args.batch_size, n_process=args.n_process,
+                           cache=cache, pool=pool)
+    else:
+        process_csv_file(src, batch_size=args.batch_size, n_process=args.n_process, cache=cache,
+                         out_path=out_path, incremental=args.incremental, pool=pool)
+
+
+def process_many(outputs: dict[Path, Path]) -> None:
+    """
+    Template several inputs on one pool of warm workers: the model is loaded
+    once per worker, and up to --jobs files feed the pool at the same time.
+    """
+    workers = args.workers or os.cpu_count() or 1
+    with TemplatePool(workers, batch_size=args.batch_size, cache_dir=args.parse_cache) as pool:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as files:
+            for done in [files.submit(process_one, src, out, pool) for src, out in outputs.items()]:
+                done.result()
+
+    if args.parse_cache:
+        # opened after the run so its size covers the segments the workers wrote
+        cache = ParseCache(args.parse_cache, MODEL_NAME,
+                           max_bytes=args.parse_cache_max_mb * 1024 * 1024)
+        cache.add_counts(pool.cache_hits, pool.cache_misses, pool.cache_written)
+        cache.evict()
+        print(cache.report())
+
 
 # CLI entry-point
 def main():
-    src = Path(input_rqs)
-    if not src.exists():
+    inputs = expand_inputs(input_rqs)
+    missing = [src for src in inputs if not src.exists()]
+    for src in missing:
         print(f"File not found: {src}")
+    if missing or not inputs:
+        return
+    if args.stream and args.incremental:
+        print("--incremental is not supported together with --stream")
         return
-    process_csv_file(src)
+
+    if len(inputs) == 1 and args.workers is None:
+        cache = None
+        if args.parse_cache:
+            cache = ParseCache(args.parse_cache, MODEL_NAME,
+                               max_bytes=args.parse_cache_max_mb * 1024 * 1024)
+        if args.output:
+            out_path = Path(args.output)
+        elif args.output_dir:
+            out_path = Path(args.output_dir) / f"{inputs[0].stem}.csv"
+        else:
+            out_path = None
+        process_one(inputs[0], out_path, cache=cache)
+    else:
+        if args.output and len(inputs) > 1:
+            print("--output names a single file; use --output-dir with several inputs")
+            return
+        if args.output:
+            outputs = {inputs[0]: Path(args.output)}
+        else:
+            outputs = output_paths(inputs, Path(args.output_dir or create_output_directory()))
+            if outputs is None:
+                return
+        process_many(outputs)
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        parent, child = rss
+        print(f"peak RSS: parent {parent:.1f} MB" + (f", largest child {child:.1f} MB" if child else ""))
 
 
 if __name__ == "__main__":
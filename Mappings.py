@@ -2,33 +2,20 @@
 # RTSREC001 - Rector Ratsaka
 
 
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterator
 from ChunkingLib import (
-    nlp,
-    mark_chunk,                   
+    get_nlp,
+    TemplateBuilder,
     _prefix_end_index,
-    _is_question_starter_token  # Import the new function
+    _is_question_starter_token,  # Import the new function
+    _protected_token_ids,
+    _doc_protected_token_ids,
+    _token_range,
+    PCUnit,
+    _pc_units_from_doc,
+    _get_PC_spans_from_units,
 )
 
-def _mark_chunk_with_mapping(
-    cq: str,
-    spans: list[tuple[int, int]],
-    chunktype: str,
-    offset: int,
-    counter: int,
-    mappings: Dict[str, str]
-) -> Tuple[str, int]:
-    """
-    Same as mark_chunk() but also stores the text→marker mapping.
-    """
-    for (start, end) in spans:
-        key = f"{chunktype}{counter}"
-        mappings[key] = cq[start - offset:end - offset]
-        cq = cq[:start - offset] + key + cq[end - offset:]
-        offset += (end - start) - len(key)
-    return cq, offset
-
-
 # EC extraction with mapping 
 def extract_EC_chunks_with_mapping(
     question: str,
@@ -43,11 +30,24 @@ def extract_EC_chunks_with_mapping(
     if mappings is None:
         mappings = {}
 
-    cq          = question
-    doc         = nlp(cq)
+    builder = _extract_EC_from_doc(get_nlp()(question), mappings)
+    return builder.build(), builder.mappings
+
+
+def _extract_EC_from_doc(
+    doc,
+    mappings: Dict[str, str]
+) -> TemplateBuilder:
+    """
+    EC pass over an already parsed question. Returns the TemplateBuilder
+    holding the accepted ECs (as edits in original character offsets), so
+    later passes can reuse `doc` instead of re-parsing the marked string.
+    """
+    cq          = doc.text
     prefix_end  = _prefix_end_index(cq)
-    offset      = 0
-    counter     = 1
+    protected   = _doc_protected_token_ids(doc)
+    starts      = [token.idx for token in doc]
+    builder     = TemplateBuilder(cq, mappings)
 
     rejecting_ec = {
         "does", "do", "can", "could", "will", "would", "should", "shall", "may", "might",
@@ -78,10 +78,7 @@ def extract_EC_chunks_with_mapping(
             doc[1].pos_ == "ADJ" and doc[2].pos_ == "VERB"):
         start = doc[1].idx
         end   = start + len(doc[1])
-        cq, offset = _mark_chunk_with_mapping(
-            cq, [(start, end)], "EC", offset, counter, mappings
-        )
-        counter += 1
+        builder.mark("EC", [(start, end)])
 
     # general noun-chunk pass
     for chunk in doc.noun_chunks:
@@ -94,13 +91,13 @@ def extract_EC_chunks_with_mapping(
         if prefix_end is not None and start < prefix_end:
             continue
             
-        text = cq[start - offset:end - offset].strip()
+        text = cq[start:end].strip()
         if not text or text.lower() in rejecting_ec:
             continue
             
         # Check if any token in this chunk is a question starter that should be preserved
-        chunk_tokens = [token for token in doc if token.idx >= start and token.idx < end]
-        if any(_is_question_starter_token(token, doc) for token in chunk_tokens):
+        chunk_tokens = _token_range(starts, start, end)
+        if any(i in protected for i in chunk_tokens):
             continue
             
         # skip leading single auxiliaries (Do/Is …)
@@ -112,16 +109,13 @@ def extract_EC_chunks_with_mapping(
         # Handle "the thing" special case
         if "the thing" in text and end - start > len("the thing"):
             # Split into two ECs
-            mappings[f"EC{counter}"] = "the"
-            mappings[f"EC{counter + 1}"] = "thing"
-            cq = cq[:start - offset] + f"EC{counter}" + f" EC{counter + 1}" + cq[end - offset:]
-            counter += 2
-            offset += (end - start) - len(f"EC{counter-2} EC{counter-1}")
+            if not builder.overlaps(start, end):
+                the, thing = builder.next_key("EC"), builder.next_key("EC")
+                builder.mappings[the] = "the"
+                builder.mappings[thing] = "thing"
+                builder.replace(start, end, f"{the} {thing}")
         else:
-            cq, offset = _mark_chunk_with_mapping(
-                cq, [(start, end)], "EC", offset, counter, mappings
-            )
-            counter += 1
+            builder.mark("EC", [(start, end)])
 
     # Handle end-of-sentence adjectives/adverbs
     try:
@@ -130,17 +124,14 @@ def extract_EC_chunks_with_mapping(
                  doc[-3].text in ['are', 'is', 'were', 'was'] and doc[-1].text == '?') or 
                 (doc[-2].pos_ in ['ADJ', 'ADV'] and doc[-1].text == '?')):
                 if (doc[-2].text.lower() not in rejecting_ec and
-                    not _is_question_starter_token(doc[-2], doc)):
+                    doc[-2].i not in protected):
                     start = doc[-2].idx
                     end = start + len(doc[-2])
-                    cq, offset = _mark_chunk_with_mapping(
-                        cq, [(start, end)], "EC", offset, counter, mappings
-                    )
-                    counter += 1
+                    builder.mark("EC", [(start, end)])
     except Exception as e:
         print('Error processing end-of-sentence. Doc = ', doc, 'Error:', e)
 
-    return cq, mappings
+    return builder
 
 
 # PC extraction with mapping
@@ -154,11 +145,23 @@ def extract_PC_chunks_with_mapping(
     if mappings is None:
         mappings = {}
 
-    cq          = question_with_ec
-    doc         = nlp(cq)
+    cq  = question_with_ec
+    doc = get_nlp()(cq)
+    return _extract_PC_from_units(cq, _pc_units_from_doc(doc), mappings)
+
+
+def _extract_PC_from_units(
+    cq: str,
+    units: list[PCUnit],
+    mappings: Dict[str, str]
+) -> Tuple[str, Dict[str, str]]:
+    """
+    PC pass over `units` - the token view of `cq` (offsets are in `cq`).
+    """
     prefix_end  = _prefix_end_index(cq)
-    offset      = 0
-    counter     = 1
+    builder     = TemplateBuilder(cq, mappings)
+    protected   = _protected_token_ids([u.text.lower() for u in units[:2]])
+    starts      = [u.start for u in units]
 
     rejecting_pc = {
         'is', 'are', 'was','can', 'were', 'do', 'does', 'did', 'have', 'had', 'has',
@@ -170,31 +173,215 @@ def extract_PC_chunks_with_mapping(
         'identifying', 'considering', 'achieve', 'compare to'
     }
 
-    from ChunkingLib import get_PCs_as_spans  # local import to avoid cycle
-    for begin, end, aux in get_PCs_as_spans(cq):
+    for begin, end, aux in _get_PC_spans_from_units(units):
         # Skip if this PC chunk is within the protected prefix
         if prefix_end is not None and begin < prefix_end:
             continue
             
-        pc_text = cq[begin - offset:end - offset].strip()
+        pc_text = cq[begin:end].strip()
         if not pc_text or pc_text.lower() in rejecting_pc:
             continue
 
         # Check if any token in this PC chunk is a question starter
-        pc_tokens = [token for token in doc if token.idx >= begin and token.idx < end]
-        if any(_is_question_starter_token(token, doc) for token in pc_tokens):
+        pc_tokens = _token_range(starts, begin, end)
+        if any(i in protected for i in pc_tokens):
             continue
 
         spans = [(begin, end)]
         
         # Handle auxiliary verbs, but check if they're question starters
-        if aux and aux.text.lower() not in rejecting_pc:
-            if not _is_question_starter_token(aux, doc):
-                spans.insert(0, (aux.idx, aux.idx + len(aux)))
+        if aux is not None and units[aux].text.lower() not in rejecting_pc:
+            if aux not in protected:
+                spans.insert(0, (units[aux].start, units[aux].end))
+
+        builder.mark("PC", spans)
+
+    return builder.build(), builder.mappings
+
+
+def _pc_units_after_EC(doc, edits: list[tuple[int, int, str]]) -> list[PCUnit]:
+    """
+    Token view of the EC-marked question built from the original `doc` and
+    the EC edits (sorted (start, end, replacement) in `doc` offsets): tokens
+    covered by an edit collapse into its marker(s), every other token keeps
+    its tags and dependencies, and offsets are shifted into the marked string.
+    This is what lets the PC pass run without re-parsing the marked string.
+    """
+    units   = []
+    unit_of = {}   # original token index -> unit index
+    e       = 0
+    shift   = 0    # characters removed by edits that end before the token
+    emitted = -1   # last edit whose marker(s) were emitted
+
+    for token in doc:
+        while e < len(edits) and edits[e][1] <= token.idx:
+            shift += (edits[e][1] - edits[e][0]) - len(edits[e][2])
+            e += 1
+        if e < len(edits) and edits[e][0] <= token.idx:
+            start, end, replacement = edits[e]
+            if emitted != e:
+                # emit the marker(s) once per edit, e.g. "EC1 EC2"
+                emitted = e
+                unit_of[token.i] = len(units)
+                pos = start - shift
+                for marker in replacement.split(" "):
+                    units.append(PCUnit(marker, "PROPN", "", None, pos, pos + len(marker)))
+                    pos += len(marker) + 1
+            else:
+                unit_of[token.i] = unit_of[token.i - 1]
+            continue
+        unit_of[token.i] = len(units)
+        units.append(PCUnit(token.text, token.pos_, token.dep_, token.head.i,
+                            token.idx - shift, token.idx - shift + len(token)))
+
+    # heads were collected as original token indices; move them to unit indices
+    return [u._replace(head=unit_of.get(u.head)) if u.head is not None else u
+            for u in units]
+
+
+# Single-parse templating
+def template_doc_with_mapping(doc) -> Tuple[str, Dict[str, str]]:
+    """
+    Return (templated_question, mappings_dict) for an already parsed question.
+    Both the EC and the PC rules run on this one `doc`.
+    """
+    ec = _extract_EC_from_doc(doc, {})
+    units = _pc_units_after_EC(doc, ec.edits)
+    return _extract_PC_from_units(ec.build(), units, ec.mappings)
+
+
+def extract_template_with_mapping(question: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Return (templated_question, mappings_dict), parsing `question` only once.
+    """
+    return template_doc_with_mapping(get_nlp()(question))
+
+
+def extract_templates_batch(
+    questions,
+    batch_size: int = 256,
+    n_process: int = 1,
+    cache=None
+) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Yield (templated_question, mappings_dict) for every question, in input
+    order. Questions are parsed in batches with `nlp.pipe`; `n_process > 1`
+    spreads the parsing over that many worker processes. With a ParseCache,
+    cached questions are not parsed at all (and the model is only loaded if
+    something is missing).
+    """
+    def parse(qs):
+        return get_nlp().pipe(qs, batch_size=batch_size, n_process=n_process)
+
+    docs = parse(questions) if cache is None else cache.pipe(questions, parse)
+    for doc in docs:
+        yield template_doc_with_mapping(doc)
+
+
+# Columns for final output CSV
+OUTPUT_COLS = [
+    "research_question", "templated_question",
+    "EC1", "EC2", "EC3", "EC4", "EC5",
+    "PC1", "PC2"
+]
+
+
+def output_row(question: str, templated: str, mappings: Dict[str, str]) -> list:
+    """One OUTPUT_COLS row (missing EC/PC slots are "")."""
+    return [question, templated] + [mappings.get(col, "") for col in OUTPUT_COLS[2:]]
+
+
+# Worker pool shared by many input files
+_worker_cache = None
+
+
+def _init_template_worker(cache_dir, model_name):
+    """Pool initializer: load the pipeline (and open the parse cache) once per worker."""
+    global _worker_cache
+    if cache_dir is not None:
+        from ParseCache import ParseCache
+        _worker_cache = ParseCache(cache_dir, model_name)
+    get_nlp()
+
+
+def _template_chunk(questions):
+    """Template one chunk in a worker; also return the chunk's cache counters."""
+    before = (0, 0, 0) if _worker_cache is None else (
+        _worker_cache.hits, _worker_cache.misses, _worker_cache.written)
+    results = list(extract_templates_batch(questions, batch_size=len(questions) or 1,
+                                           cache=_worker_cache))
+    after = (0, 0, 0) if _worker_cache is None else (
+        _worker_cache.hits, _worker_cache.misses, _worker_cache.written)
+    return results, tuple(a - b for a, b in zip(after, before))
+
+
+def _prepare_and_template(prepare, payload):
+    """Run `prepare(payload)` -> (data, questions) in a worker and template the questions there."""
+    data, questions = prepare(payload)
+    results, counts = _template_chunk(questions)
+    return data, list(zip(questions, results)), counts
+
+
+class TemplatePool:
+    """
+    Worker processes that each load the spaCy pipeline once and then template
+    questions for any number of inputs. `extract_templates` splits its input
+    into chunks of `batch_size` and may be called from several threads at once,
+    so one pool keeps all workers busy across files.
+    """
+
+    def __init__(self, workers: int, batch_size: int = 256, cache_dir=None):
+        import multiprocessing
+        import threading
+        from ChunkingLib import MODEL_NAME
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_written = 0
+        self._pool = multiprocessing.Pool(
+            workers, initializer=_init_template_worker,
+            initargs=(None if cache_dir is None else str(cache_dir), MODEL_NAME))
+
+    def extract_templates(self, questions) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Yield (templated_question, mappings_dict) per question, in input order."""
+        questions = list(questions)
+        chunks = [questions[i:i + self.batch_size]
+                  for i in range(0, len(questions), self.batch_size)]
+        for results, (hits, misses, written) in self._pool.imap(_template_chunk, chunks):
+            with self._lock:
+                self.cache_hits += hits
+                self.cache_misses += misses
+                self.cache_written += written
+            yield from results
+
+    def submit(self, prepare, payload):
+        """
+        Queue `prepare(payload)` and the templating of the questions it
+        returns as one task for a worker, without waiting for it. `prepare`
+        must be a picklable callable returning (data, questions); pass the
+        returned handle to `result` to get (data, [(question, (templated,
+        mappings)), ...]). Several tasks can be in flight at once.
+        """
+        return self._pool.apply_async(_prepare_and_template, (prepare, payload))
+
+    def result(self, handle):
+        """Wait for a task queued with `submit` and return (data, templated questions)."""
+        data, templated, (hits, misses, written) = handle.get()
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+            self.cache_written += written
+        return data, templated
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
 
-        cq, offset = _mark_chunk_with_mapping(
-            cq, spans, "PC", offset, counter, mappings
-        )
-        counter += 1
+    def __enter__(self):
+        return self
 
-    return cq, mappings
\ No newline at end of file
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self._pool.terminate()
+        self.close()
@@ -0,0 +1,151 @@
+# Opt-in on-disk cache of parsed research questions (serialized spaCy Docs).
+# Entries are keyed by a hash of the question text and the model name/version,
+# so warm runs over the same CSV files never load or run the spaCy model.
+# RTSREC001 - Rector Ratsaka
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+
+class ParseCache:
+    """
+    Directory of DocBin segments. Every batch of newly parsed questions is
+    written as one segment: <name>.spacy holds the Docs and <name>.keys lists
+    their keys in the same order. Reading from a segment touches its mtime,
+    and once the cache grows past `max_bytes` the least recently used
+    segments are deleted.
+    """
+
+    MAX_LOADED_SEGMENTS = 4
+
+    def __init__(self, cache_dir: str | Path, model_name: str,
+                 model_version: str | None = None,
+                 max_bytes: int = 512 * 1024 * 1024):
+        import spacy
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        if model_version is None:
+            model_version = spacy.util.get_package_version(model_name) or "unknown"
+        self._salt = f"{model_name}=={model_version}|spacy=={spacy.__version__}\0"
+        self._vocab = None
+        self._index = {}    # key -> (segment name, position in segment)
+        self._loaded = {}   # segment name -> list of Docs, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+        self.evicted = 0
+        self.size = 0
+
+        for keys_file in self.cache_dir.glob("*.keys"):
+            segment = self.cache_dir / (keys_file.stem + ".spacy")
+            if not segment.exists():
+                continue
+            self.size += segment.stat().st_size
+            with open(keys_file, encoding="utf-8") as fh:
+                for pos, key in enumerate(fh.read().split()):
+                    self._index[key] = (keys_file.stem, pos)
+
+    def _key(self, question: str) -> str:
+        return hashlib.sha1((self._salt + question).encode("utf-8")).hexdigest()
+
+    @property
+    def vocab(self):
+        # A blank English vocab is enough to restore tags, heads and noun chunks
+        if self._vocab is None:
+            import spacy
+            self._vocab = spacy.blank("en").vocab
+        return self._vocab
+
+    def _segment_docs(self, name: str) -> list | None:
+        from spacy.tokens import DocBin
+        if name not in self._loaded:
+            path = self.cache_dir / (name + ".spacy")
+            try:
+                docs = list(DocBin().from_disk(path).get_docs(self.vocab))
+            except FileNotFoundError:
+                return None
+            os.utime(path)
+            if len(self._loaded) >= self.MAX_LOADED_SEGMENTS:
+                del self._loaded[next(iter(self._loaded))]
+            self._loaded[name] = docs
+        return self._loaded[name]
+
+    def get(self, question: str):
+        """Return the cached Doc for `question`, or None."""
+        entry = self._index.get(self._key(question))
+        docs = self._segment_docs(entry[0]) if entry is not None else None
+        if docs is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return docs[entry[1]]
+
+    def put_many(self, questions: list[str], docs: list) -> None:
+        """Store `docs` (parses of `questions`, same order) as a new segment."""
+        from spacy.tokens import DocBin
+        if not docs:
+            return
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self.written}"
+        keys = [self._key(q) for q in questions]
+        segment = self.cache_dir / (name + ".spacy")
+        # segment first, keys last: a segment only becomes visible once complete
+        DocBin(docs=docs).to_disk(segment.with_suffix(".tmp"))
+        os.replace(segment.with_suffix(".tmp"), segment)
+        keys_tmp = self.cache_dir / (name + ".keys.tmp")
+        keys_tmp.write_text("\n".join(keys), encoding="utf-8")
+        os.replace(keys_tmp, self.cache_dir / (name + ".keys"))
+
+        for pos, key in enumerate(keys):
+            self._index[key] = (name, pos)
+        self.written += len(docs)
+        self.size += segment.stat().st_size
+
+    def pipe(self, questions: Iterable[str],
+             parse: Callable[[list[str]], Iterable]) -> Iterator:
+        """
+        Yield a Doc per question, in input order. Cache misses are parsed
+        together with one call to `parse` (e.g. a batched nlp.pipe) and stored.
+        """
+        questions = list(questions)
+        docs = [self.get(q) for q in questions]
+        missing = [i for i, doc in enumerate(docs) if doc is None]
+        if missing:
+            parsed = list(parse([questions[i] for i in missing]))
+            self.put_many([questions[i] for i in missing], parsed)
+            for i, doc in zip(missing, parsed):
+                docs[i] = doc
+        yield from docs
+
+    def evict(self) -> None:
+        """Delete least recently used segments until the cache fits `max_bytes`."""
+        if self.size <= self.max_bytes:
+            return
+        segments = sorted((p.stat().st_mtime, p.stat().st_size, p)
+                          for p in self.cache_dir.glob("*.spacy"))
+        self.size = sum(size for _, size, _ in segments)
+        for _, size, path in segments:
+            if self.size <= self.max_bytes:
+                break
+            path.with_suffix(".keys").unlink(missing_ok=True)
+            path.unlink()
+            self._loaded.pop(path.stem, None)
+            self._index = {k: v for k, v in self._index.items() if v[0] != path.stem}
+            self.size -= size
+            self.evicted += 1
+
+    def add_counts(self, hits: int, misses: int, written: int) -> None:
+        """Fold in counters of caches used by other processes on the same directory."""
+        self.hits += hits
+        self.misses += misses
+        self.written += written
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100.0) if total else 0.0
+        return (f"parse cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+                f"{self.written} written, {self.evicted} segments evicted, "
+                f"{self.size / (1024 * 1024):.1f} MB in {self.cache_dir}")
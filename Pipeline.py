@@ -0,0 +1,265 @@
+# Run abstracts -> LLM research questions -> CNL templates as one pipelined job.
+# Generation runs in a background thread and feeds a bounded queue; RQ cleaning
+# and templating run on a pool of spaCy worker processes while the next batch
+# generates, and templated rows are streamed to the output CSV.
+# Usage: python3 Pipeline.py <abstracts.json> <prompts_file> [--family mistral|llama] [--output CSV] [--stub]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import csv
+import os
+import queue
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "models"))
+from Generation import (BatchedGenerator, CachedGenerator, StubGenerator, clean_rq_lines,
+                        generation_settings, load_model, read_abstracts, select_abstracts,
+                        template_prefix)
+from Dedup import dedup_entries, dedup_report, write_clusters
+from ResponseCache import ResponseCache
+from ChunkingLib import MODEL_NAME
+from Mappings import OUTPUT_COLS, TemplatePool, output_row
+from ParseCache import ParseCache
+
+# Model defaults and RQ numbering patterns of models/mistral.py and models/llama.py
+FAMILIES = {
+    "mistral": ("mistralai/Mistral-7B-Instruct-v0.3", r'^\s*["\']?\d+[\.\)]?\s*'),
+    "llama":   ("meta-llama/Llama-3.2-3B-Instruct",   r'^\s*["\']?\d+[\.\)]\s*'),
+}
+
+
+def clean_responses(batch: list, number_re: str) -> tuple[list, list]:
+    """
+    Worker side of a generated batch of (entry position, url, response): the
+    RQ rows of every response (None where generation failed) and the batch's
+    distinct questions, which the worker then templates.
+    """
+    rows = [(pos, None if response is None else
+             [{"url": url, "research_question": line} for line in clean_rq_lines(response, number_re)])
+            for pos, url, response in batch]
+    questions = list(dict.fromkeys(row["research_question"] for _, rq_rows in rows for row in rq_rows or []))
+    return rows, questions
+
+
+def run_pipeline(generator: BatchedGenerator, entries: list, prompt_template: str,
+                 number_re: str, pool: TemplatePool, out_path: Path,
+                 rqs_path: Path | None = None, queue_size: int = 4,
+                 sort: bool = False, overlap: bool = True,
+                 representative: list | None = None) -> dict:
+    """
+    Generate RQs for `entries` and write their CNL templates (OUTPUT_COLS) to
+    `out_path` as batches come in, dropping repeated questions. Every
+    generated batch is handed to the pool as soon as it is out of the model,
+    so its cleaning and templating run in the workers while the next batch
+    generates; up to `queue_size` batches are in flight and results are
+    written in generation order. With `sort`, the file is rewritten at the
+    end shortest template first, ties in abstract order: the same file
+    Generate.py makes from the model's RQ CSV. `overlap=False` generates
+    everything before templating (for comparison). With `representative`
+    (entry position -> position of its near-duplicate cluster's
+    representative, see Dedup.py), only representatives are generated and
+    the RQ output repeats each representative's rows under the url of every
+    duplicate, as generate_rqs does.
+    """
+    if representative is None:
+        representative = list(range(len(entries)))
+    positions = [i for i, rep in enumerate(representative) if rep == i]
+    duplicates = {}  # representative position -> positions of its duplicates
+    for i, rep in enumerate(representative):
+        if rep != i:
+            duplicates.setdefault(rep, []).append(i)
+    prepare = partial(clean_responses, number_re=number_re)
+    prompts = [prompt_template.format(abstract=entries[i]["abstract"].strip()) for i in positions]
+    batches = queue.Queue(maxsize=queue_size if overlap else 0)
+    failed = []
+    generated_at = []
+
+    def produce():
+        try:
+            for batch in generator.generate_batches(prompts):
+                payload = [(positions[j], entries[positions[j]].get("url", ""), response)
+                           for j, response in batch]
+                batches.put(pool.submit(prepare, payload) if overlap else payload)
+        except BaseException as e:  # re-raised in the consumer
+            failed.append(e)
+        finally:
+            generated_at.append(time.perf_counter())
+            batches.put(None)
+
+    def handles():
+        if overlap:
+            while (handle := batches.get()) is not None:
+                yield handle
+            return
+        producer.join()
+        payloads = []
+        while (payload := batches.get()) is not None:
+            payloads.append(payload)
+        yield from [pool.submit(prepare, payload) for payload in payloads]
+
+    hits_before = getattr(generator, "cache_hits", 0)
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    seen = {}     # question -> (abstract position, line) of its first occurrence
+    rows = []     # kept only for the final sort
+    written = 0
+    wait_s = 0.0
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    rqs_fh = open(rqs_path, "w", newline="", encoding="utf-8") if rqs_path else None
+    try:
+        with open(out_path, "w", newline="", encoding="utf-8") as out_fh:
+            writer = csv.writer(out_fh, lineterminator="\n")
+            writer.writerow(OUTPUT_COLS)
+            rqs_writer = None
+            if rqs_fh:
+                rqs_writer = csv.DictWriter(rqs_fh, fieldnames=["url", "research_question"])
+                rqs_writer.writeheader()
+
+            for handle in handles():
+                t = time.perf_counter()
+                batch, templated = pool.result(handle)
+                wait_s += time.perf_counter() - t
+                templated = dict(templated)
+
+                questions = []
+                for pos, rq_rows in sorted(batch, key=lambda b: b[0]):
+                    if rqs_writer:
+                        rqs_writer.writerows(rq_rows or [])
+                        for i in duplicates.get(pos, []):
+                            url = entries[i].get("url", "")
+                            rqs_writer.writerows({**row, "url": url} for row in rq_rows or [])
+                    for line, row in enumerate(rq_rows or []):
+                        q = row["research_question"]
+                        if q in seen:
+                            seen[q] = min(seen[q], (pos, line))
+                            continue
+                        seen[q] = (pos, line)
+                        questions.append(q)
+
+                for q in questions:
+                    row = output_row(q, *templated[q])
+                    writer.writerow(row)
+                    if sort:
+                        rows.append(row)
+                out_fh.flush()
+                written += len(questions)
+    finally:
+        if rqs_fh:
+            rqs_fh.close()
+    if failed:
+        raise failed[0]
+
+    if sort:
+        rows.sort(key=lambda r: (len(r[1]), seen[r[0]]))
+        with open(out_path, "w", newline="", encoding="utf-8") as out_fh:
+            writer = csv.writer(out_fh, lineterminator="\n")
+            writer.writerow(OUTPUT_COLS)
+            writer.writerows(rows)
+
+    elapsed = time.perf_counter() - start
+    cached = getattr(generator, "cache_hits", 0) - hits_before
+    return {"abstracts": len(entries), "generated": len(positions) - cached, "cached": cached,
+            "duplicates": len(entries) - len(positions),
+            "questions": written, "seconds": elapsed,
+            "template_wait_seconds": wait_s,
+            "tail_seconds": elapsed - (generated_at[0] - start),
+            "abstracts_per_sec": len(positions) / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Abstracts -> LLM research questions -> CNL templates, pipelined.")
+    parser.add_argument("input_file", type=str, help="Path to the input abstracts JSON file (or .jsonl abstract store).")
+    parser.add_argument("prompts_file", type=str, help="Path to the prompts text file.")
+    parser.add_argument("--family", choices=sorted(FAMILIES), default="mistral",
+                        help="Model family: default model and RQ numbering format.")
+    parser.add_argument("--model", type=str, default=None, help="Model name or local path.")
+    parser.add_argument("--dtype", type=str, default="bfloat16", help="torch dtype of the model weights.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Max abstracts per generation batch.")
+    parser.add_argument("--max-batch-tokens", type=int, default=32768,
+                        help="Token budget per batch: size x (longest prompt + max new tokens).")
+    parser.add_argument("--max-new-tokens", type=int, default=256, help="Tokens generated per abstract.")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Prefill the prompt text before {abstract} once and reuse its key/values.")
+    parser.add_argument("--output", type=str, default="cnl_output/pipeline.csv", help="Output CNL CSV.")
+    parser.add_argument("--rqs-output", type=str, default=None,
+                        help="Also write the generated RQs (url, research_question) here.")
+    parser.add_argument("--sort", action="store_true",
+                        help="Rewrite the output shortest template first at the end (as Generate.py does).")
+    parser.add_argument("--workers", type=int, default=None, help="spaCy worker processes (default: CPU count).")
+    parser.add_argument("--queue-size", type=int, default=4, help="Generated batches waiting for templating.")
+    parser.add_argument("--parse-cache", type=str, default=None, help="Directory for cached parses (opt-in).")
+    parser.add_argument("--parse-cache-max-mb", type=int, default=512, help="Size limit of the parse cache in MB.")
+    parser.add_argument("--response-cache", type=str, default=None, help="Directory for cached LLM responses (opt-in).")
+    parser.add_argument("--response-cache-max-mb", type=int, default=256, help="Size limit of the response cache in MB.")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Generate only one abstract per cluster of near-duplicates (MinHash/LSH); the others reuse its RQs.")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="Jaccard similarity of word 3-gram shingles above which abstracts are near-duplicates.")
+    parser.add_argument("--dedup-report", type=str, default=None,
+                        help="Write every skipped duplicate with its representative to this CSV.")
+    parser.add_argument("--stub", action="store_true", help="Use a stub generator instead of the model.")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="Seconds per stub batch (simulated GPU time).")
+    args = parser.parse_args()
+
+    with open(args.prompts_file, "r", encoding="utf-8") as f:
+        prompt_template = f.read().strip()
+    target_ids = set(range(1, 2501))
+    entries = select_abstracts(read_abstracts(args.input_file, target_ids), target_ids)
+    representative = None
+    if args.dedup:
+        representative, dedup_summary = dedup_entries(entries, args.dedup_threshold)
+        print(dedup_report(dedup_summary))
+        if args.dedup_report:
+            write_clusters(args.dedup_report, entries, representative)
+    model_name, number_re = FAMILIES[args.family]
+
+    # start the spaCy workers before the model is loaded and threads exist
+    with TemplatePool(args.workers or os.cpu_count() or 1, cache_dir=args.parse_cache) as pool:
+        if args.stub:
+            generator = StubGenerator(max_batch_size=args.batch_size, delay=args.stub_delay)
+        else:
+            tokenizer, model = load_model(args.model or model_name, args.dtype)
+            generator = BatchedGenerator(tokenizer, model,
+                                         max_new_tokens=args.max_new_tokens,
+                                         max_batch_size=args.batch_size,
+                                         max_batch_tokens=args.max_batch_tokens,
+                                         prefix=template_prefix(prompt_template) if args.prefix_cache else None)
+        cache = None
+        if args.response_cache:
+            cache = ResponseCache(args.response_cache,
+                                  generation_settings("stub" if args.stub else args.model or model_name,
+                                                      None if args.stub else model,
+                                                      max_new_tokens=args.max_new_tokens, dtype=args.dtype),
+                                  max_bytes=args.response_cache_max_mb * 1024 * 1024)
+            generator = CachedGenerator(generator, cache)
+        stats = run_pipeline(generator, entries, prompt_template, number_re, pool, Path(args.output),
+                             rqs_path=Path(args.rqs_output) if args.rqs_output else None,
+                             queue_size=args.queue_size, sort=args.sort,
+                             representative=representative)
+
+    print(f"saved {stats['questions']} templated questions to {args.output}")
+    if cache is not None:
+        cache.evict()
+        print(cache.report())
+    if args.parse_cache:
+        # opened after the run so its size covers the segments the workers wrote
+        parse_cache = ParseCache(args.parse_cache, MODEL_NAME,
+                                 max_bytes=args.parse_cache_max_mb * 1024 * 1024)
+        parse_cache.add_counts(pool.cache_hits, pool.cache_misses, pool.cache_written)
+        parse_cache.evict()
+        print(parse_cache.report())
+    print(f"{stats['abstracts']} abstracts ({stats['generated']} generated by the model, "
+          f"{stats['cached']} from the response cache, {stats['duplicates']} near-duplicates reused a "
+          f"representative's RQs) in {stats['seconds']:.1f}s "
+          f"({stats['abstracts_per_sec']:.2f} abstracts/s); waited {stats['template_wait_seconds']:.1f}s for "
+          f"templated batches, {stats['tail_seconds']:.1f}s of the run came after generation finished")
+
+
+if __name__ == "__main__":
+    main()
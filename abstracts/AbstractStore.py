@@ -0,0 +1,224 @@
+# Append-only JSONL store of scraped abstracts with a sidecar byte-offset
+# index by id and url, so readers can stream records or seek straight to the
+# ids they need instead of loading one monolithic JSON file.
+# RTSREC001 - Rector Ratsaka
+
+import json
+import os
+from typing import Iterable, Iterator
+
+
+class AbstractStore:
+    """
+    <path> holds one abstract record per line ({"id", "title", "abstract",
+    "url"}); <path>.idx holds one "offset<TAB>length<TAB>id<TAB>url" line
+    per record. Records are appended a batch (e.g. a volume) at a time, data
+    first and index last, both flushed to disk. On open, a torn last line is
+    cut off and records missing from the index are re-indexed from the data,
+    so a killed collector leaves a consistent store.
+    """
+
+    def __init__(self, path: str, create: bool = True):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._offsets = {}   # id -> (offset, length) of its line
+        self._record_urls = {}  # id -> url
+        self._urls = {}      # url -> id of its first record
+        self._end = 0        # bytes of the data file covered by the index
+
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(f"no abstract store at {path}")
+            open(path, "wb").close()
+        size = self._cut_torn_line(path)
+        if os.path.exists(self.index_path):
+            self._cut_torn_line(self.index_path)
+            with open(self.index_path, encoding="utf-8") as fh:
+                lines = fh.readlines()
+            for line in lines:
+                offset, length, record_id, url = line.rstrip("\n").split("\t", 3)
+                offset, length = int(offset), int(length)
+                if offset + length > size:
+                    break  # the data was cut short after this entry was indexed
+                record_id = int(record_id) if record_id.isdigit() else json.loads(record_id)
+                self._add(record_id, url or None, offset, length)
+            if len(self._offsets) < len(lines):
+                self._write_index(self._offsets, "w")
+        if self._end < size:
+            self._reindex_from(self._end)
+
+    @staticmethod
+    def _cut_torn_line(path: str, block: int = 1 << 16) -> int:
+        """Truncate `path` after its last newline; returns the size kept."""
+        size = os.path.getsize(path)
+        keep = 0
+        with open(path, "rb") as fh:
+            end = size
+            while end > 0:
+                start = max(0, end - block)
+                fh.seek(start)
+                i = fh.read(end - start).rfind(b"\n")
+                if i >= 0:
+                    keep = start + i + 1
+                    break
+                end = start
+        if keep < size:
+            with open(path, "r+b") as fh:
+                fh.truncate(keep)
+        return keep
+
+    def _add(self, record_id, url, offset: int, length: int) -> None:
+        self._offsets[record_id] = (offset, length)
+        self._record_urls[record_id] = url
+        self._urls.setdefault(url, record_id)
+        self._end = max(self._end, offset + length)
+
+    def _reindex_from(self, offset: int) -> None:
+        """Index the records of the data file from `offset` on (written but never indexed)."""
+        new = []
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                record = json.loads(line)
+                self._add(record["id"], record.get("url"), offset, len(line))
+                new.append(record["id"])
+                offset += len(line)
+        self._write_index(new, "a")
+
+    def _write_index(self, ids: Iterable, mode: str) -> None:
+        with open(self.index_path, mode, encoding="utf-8") as fh:
+            for record_id in ids:
+                offset, length = self._offsets[record_id]
+                url = self._record_urls[record_id] or ""
+                fh.write(f"{offset}\t{length}\t{json.dumps(record_id)}\t{url}\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, record_id) -> bool:
+        return record_id in self._offsets
+
+    def has_url(self, url: str) -> bool:
+        return url in self._urls
+
+    def ids_with_url(self, url: str) -> list:
+        """Ids of every record with `url`, in file order (e.g. all "No URL" papers)."""
+        return [i for i, u in self._record_urls.items() if u == url]
+
+    @property
+    def next_id(self) -> int:
+        """First free integer id (ids are assigned sequentially)."""
+        return max((i for i in self._offsets if isinstance(i, int)), default=0) + 1
+
+    def append(self, records: list[dict]) -> int:
+        """
+        Append `records` and index them; returns how many were appended. A
+        record whose id is already in the store (or earlier in `records`) is
+        skipped, so re-adding a batch keeps the first copy of every id.
+        """
+        seen = set(self._offsets)
+        new = []
+        for record in records:
+            if record["id"] not in seen:
+                seen.add(record["id"])
+                new.append(record)
+        records = new
+        ids = [record["id"] for record in records]
+        if not records:
+            return 0
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+        with open(self.path, "ab") as fh:
+            offset = fh.tell()
+            fh.write(b"".join(lines))
+            fh.flush()
+            os.fsync(fh.fileno())
+        for record, line in zip(records, lines):
+            self._add(record["id"], record.get("url"), offset, len(line))
+            offset += len(line)
+        self._write_index(ids, "a")
+        return len(records)
+
+    def get(self, record_id) -> dict | None:
+        """The record with `record_id`, or None."""
+        entry = self._offsets.get(record_id)
+        if entry is None:
+            return None
+        with open(self.path, "rb") as fh:
+            fh.seek(entry[0])
+            return json.loads(fh.read(entry[1]))
+
+    def get_by_url(self, url: str) -> dict | None:
+        record_id = self._urls.get(url)
+        return self.get(record_id) if record_id is not None else None
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.read()
+
+    def read(self, target_ids: Iterable | None = None) -> Iterator[dict]:
+        """
+        Stream records in file order: all of them, or only those whose id is
+        in `target_ids`. Selected records that sit next to each other in the
+        file (e.g. an id range) are read with one seek and one read per run.
+        """
+        if target_ids is None:
+            with open(self.path, "rb") as fh:
+                for line in fh:
+                    yield json.loads(line)
+            return
+
+        spans = sorted(self._offsets[i] for i in set(target_ids) if i in self._offsets)
+        with open(self.path, "rb") as fh:
+            start = 0
+            while start < len(spans):
+                end = start + 1
+                while end < len(spans) and spans[end][0] == spans[end - 1][0] + spans[end - 1][1]:
+                    end += 1
+                fh.seek(spans[start][0])
+                data = fh.read(spans[end - 1][0] + spans[end - 1][1] - spans[start][0])
+                for line in data.splitlines():
+                    yield json.loads(line)
+                start = end
+
+
+def read_abstracts(path: str, target_ids: Iterable | None = None) -> Iterator[dict]:
+    """
+    Abstract records of a JSONL store or of a JSON list file, in file order;
+    only ids in `target_ids` when given. A store is read through its index.
+    """
+    if path.endswith(".jsonl"):
+        yield from AbstractStore(path, create=False).read(target_ids)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        abstracts = json.load(f)
+    if target_ids is not None:
+        target_ids = set(target_ids)
+    for entry in abstracts:
+        if target_ids is None or entry.get("id") in target_ids:
+            yield entry
+
+
+def json_to_store(json_path: str, store_path: str) -> tuple[AbstractStore, int]:
+    """
+    Copy the records of a JSON list file into a (new or existing) store;
+    returns the store and how many records were skipped as duplicate ids.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        abstracts = json.load(f)
+    store = AbstractStore(store_path)
+    added = store.append(abstracts)
+    return store, len(abstracts) - added
+
+
+def store_to_json(store_path: str, json_path: str, target_ids: Iterable | None = None,
+                  ensure_ascii: bool = False) -> int:
+    """
+    Write the store (or the `target_ids` records) as a JSON list file like
+    the collector's (`ensure_ascii` escapes non-ASCII characters, as in
+    combined_abstracts_2500.json).
+    """
+    records = list(AbstractStore(store_path, create=False).read(target_ids))
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=ensure_ascii, indent=2)
+    return len(records)
@@ -0,0 +1,165 @@
+# Concurrent HTTP fetching for the abstract collector: one pooled session,
+# a bounded worker pool, a per-host rate limit and an opt-in on-disk cache
+# that revalidates pages with ETag / Last-Modified, so re-scrapes only
+# download the pages that changed.
+# RTSREC001 - Rector Ratsaka
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class RateLimiter:
+    """
+    At most `rate` requests per second to each host. Every request reserves
+    the next free slot of its host under a lock and then sleeps outside it,
+    so concurrent workers are spaced out instead of bursting.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = {}   # host -> earliest start of its next request
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class HttpCache:
+    """
+    Directory of cached responses: <key>.html holds the body and <key>.json
+    the URL with its ETag / Last-Modified validators. Only responses that
+    carry a validator are stored; they are sent back as If-None-Match /
+    If-Modified-Since and a 304 answer is served from disk.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.revalidated = 0
+        self.downloaded = 0
+        self.written = 0
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def validators(self, url: str) -> dict:
+        """Conditional request headers for `url` ({} if it is not cached)."""
+        try:
+            meta = json.loads(self._path(url).with_suffix(".json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not self._path(url).with_suffix(".html").exists():
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url: str) -> str:
+        with self._lock:
+            self.revalidated += 1
+        return self._path(url).with_suffix(".html").read_text(encoding="utf-8")
+
+    def store(self, url: str, response: requests.Response) -> None:
+        with self._lock:
+            self.downloaded += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        path = self._path(url)
+        # body first, metadata last: an entry only becomes visible once complete
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(response.text, encoding="utf-8")
+        os.replace(tmp, path.with_suffix(".html"))
+        tmp.write_text(json.dumps({"url": url, "etag": etag, "last_modified": last_modified}),
+                       encoding="utf-8")
+        os.replace(tmp, path.with_suffix(".json"))
+        with self._lock:
+            self.written += 1
+
+    def report(self) -> str:
+        total = self.revalidated + self.downloaded
+        rate = (self.revalidated / total * 100.0) if total else 0.0
+        return (f"http cache: {self.revalidated} unchanged (304), {self.downloaded} downloaded "
+                f"({rate:.1f}% served from cache), {self.written} written to {self.cache_dir}")
+
+
+class Fetcher:
+    """
+    GET pages through one requests.Session whose connection pool is sized
+    for `workers` threads. Transient failures (connection errors, 429, 5xx)
+    are retried with backoff.
+    """
+
+    def __init__(self, workers: int = 4, rate: float = 1.0,
+                 cache: HttpCache | None = None, timeout: float = 30.0,
+                 retries: int = 3):
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers,
+                              max_retries=Retry(total=retries, backoff_factor=1.0,
+                                                status_forcelist=(429, 500, 502, 503, 504),
+                                                allowed_methods=("GET",)))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str) -> str:
+        """Body of `url`; raises requests.HTTPError on an error status."""
+        headers = self.cache.validators(url) if self.cache else {}
+        self.limiter.wait(url)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and headers:
+            return self.cache.load(url)
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(url, response)
+        return response.text
+
+    def map(self, handle: Callable[[str, str], object], urls: Iterable[str]) -> Iterator:
+        """
+        Fetch `urls` on the worker pool and yield (url, handle(url, body)) in
+        input order; a failed fetch or handler yields (url, exception) instead.
+        """
+        def work(url):
+            try:
+                return url, handle(url, self.get(url))
+            except Exception as e:
+                return url, e
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            yield from pool.map(work, urls)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
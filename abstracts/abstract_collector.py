@@ -1,74 +1,255 @@
 # Script to scrape abstracts from conferences on ACL Anthology
-# Saves the abstracts to a JSON file.
-# Usage: python3 abstract_collector.py <conference_acronym>
+# Saves the abstracts to a JSON file, or appends them to a JSONL abstract store.
+# Usage: python3 abstract_collector.py <conference_acronym> [--workers N] [--rate R] [--cache-dir DIR] [--store JSONL]
 # RTSREC001 - Rector Ratsaka
 
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import json
 import time
-import argparse
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlsplit
 
-# command line args
-parser = argparse.ArgumentParser(description="Scrape abstracts from ACL Anthology conferences.")
-parser.add_argument("conference", type=str, help="Conference acronym (e.g., lrec, cl, wmt, ranlp, conll).")
-args = parser.parse_args()
-conference = args.conference.lower()
-
-BASE_URL = "https://aclanthology.org"
-VENUE_URL = f"{BASE_URL}/venues/{conference}/"
-
-# Get all volume links from the venue page
-res = requests.get(VENUE_URL)
-soup = BeautifulSoup(res.text, "html.parser")
-
-volume_links = soup.find_all("a", href=True)
-volume_urls = sorted(set(
-    BASE_URL + link["href"]
-    for link in volume_links
-    if link["href"].startswith("/volumes/") and link["href"].endswith("/")
-))
-
-print(f"Found {len(volume_urls)} volume URLs")
-
-# Loop over each volume and extract abstracts
-results = []
-paper_id = 1
-
-for volume_url in volume_urls:
-    print(f"Scraping: {volume_url}")
-    try:
-        vres = requests.get(volume_url)
-        vsoup = BeautifulSoup(vres.text, "html.parser")
-
-        abstracts = vsoup.find_all("div", class_="card-body p-3 small")
-        titles = vsoup.find_all("p", class_="d-sm-flex align-items-stretch")
-        
-
-        for abstract, title_block in zip(abstracts, titles):
-            title_tag = title_block.find("strong")
-            link_tag = title_tag.find("a") if title_tag else None
-
-            title = title_tag.text.strip() if title_tag else "No Title"
-            abstract_text = abstract.text.strip()
-            url = "https://aclanthology.org" + link_tag['href'] if link_tag else "No URL"
-
-            results.append({
-                "id": paper_id,
-                "title": title,
-                "abstract": abstract_text,
-                "url": url
-            })
-            paper_id += 1
+from bs4 import BeautifulSoup
 
-        time.sleep(1) 
+from AbstractStore import AbstractStore
+from Fetcher import Fetcher, HttpCache
 
-    except Exception as e:
-        print(f"Error scraping {volume_url}: {e}")
-        continue
+BASE_URL = "https://aclanthology.org"
 
-# Save results to JSON
-with open(f"{conference}_abstracts.json", "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
 
-print(f"\nFinished. Collected {len(results)} abstracts.")
\ No newline at end of file
+def volume_urls(venue_html: str, base_url: str = BASE_URL) -> list[str]:
+    """All volume links on a venue page."""
+    soup = BeautifulSoup(venue_html, "html.parser")
+    volume_links = soup.find_all("a", href=True)
+    return sorted(set(
+        base_url + link["href"]
+        for link in volume_links
+        if link["href"].startswith("/volumes/") and link["href"].endswith("/")
+    ))
+
+
+# Classes of the parts of a volume page the collector reads
+TITLE_CLASSES = {"d-sm-flex", "align-items-stretch"}
+ABSTRACT_CLASS = "abstract-collapse"
+BODY_CLASSES = {"card-body", "p-3", "small"}
+
+
+class VolumeParser(HTMLParser):
+    """
+    Streaming parse of a volume page that keeps only what the collector
+    needs, without building a tree: for every title block <p> its title
+    (the <strong> text), paper link and the "#abstract-<paper>" anchor of
+    its abstract toggle, and for every abstract container its id and text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.titles = []       # [title, url, anchor or None], from the first <strong> of a block
+        self.abstracts = {}    # anchor -> abstract text
+        self.unanchored = []   # abstracts outside an anchored container
+        self._title = None     # title block being read
+        self._strong = 0       # depth inside its first <strong>
+        self._strong_seen = False
+        self._text = None      # text parts of the title or abstract being read
+        self._abstract_id = None
+        self._div_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._div_depth:
+            if tag == "div":
+                self._div_depth += 1
+            return
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        if tag == "p" and TITLE_CLASSES <= classes:
+            self._title = ["No Title", "No URL", None]
+            self._strong_seen = False
+        elif tag == "div" and (ABSTRACT_CLASS in classes or BODY_CLASSES <= classes):
+            self._abstract_id = attrs.get("id") if ABSTRACT_CLASS in classes else None
+            self._div_depth = 1
+            self._text = []
+        elif self._title is None:
+            return
+        elif tag == "strong" and (self._strong or not self._strong_seen):
+            self._strong_seen = True
+            self._strong += 1
+            if self._text is None:
+                self._text = []
+        elif tag == "a":
+            href = attrs.get("href") or ""
+            if href.startswith("#abstract-"):
+                self._title[2] = href[1:]
+            elif self._strong and self._title[1] == "No URL":
+                self._title[1] = BASE_URL + href
+
+    def handle_endtag(self, tag):
+        if self._div_depth:
+            if tag == "div":
+                self._div_depth -= 1
+                if not self._div_depth:
+                    text = "".join(self._text).strip()
+                    if self._abstract_id:
+                        self.abstracts[self._abstract_id] = text
+                    else:
+                        self.unanchored.append(text)
+                    self._text = None
+        elif self._title is None:
+            return
+        elif tag == "strong" and self._strong:
+            self._strong -= 1
+            if not self._strong and self._text is not None:
+                self._title[0] = "".join(self._text).strip()
+                self._text = None
+        elif tag == "p":
+            if self._text is not None:  # unclosed <strong>
+                self._title[0] = "".join(self._text).strip()
+            self.titles.append(self._title)
+            self._title = None
+            self._strong = 0
+            self._text = None
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+
+def parse_volume(volume_html: str) -> list[dict]:
+    """
+    (title, abstract, url) of every paper with an abstract on a volume page.
+    A title block links to its abstract container ("#abstract-<paper>"), so
+    papers without an abstract (e.g. front matter) are skipped rather than
+    shifting every later abstract onto the wrong title. Abstracts whose
+    container has no anchor are paired by position with the titles whose
+    anchor found no container; on pages without any anchors that is every
+    title, as before. Unanchored abstracts left over are skipped and logged.
+    """
+    parser = VolumeParser()
+    parser.feed(volume_html)
+    parser.close()
+
+    anchored = any(anchor is not None for _, _, anchor in parser.titles) or parser.abstracts
+    leftover = [i for i, (_, _, anchor) in enumerate(parser.titles)
+                if (anchor is not None or not anchored) and anchor not in parser.abstracts]
+    paired = {i: parser.abstracts[anchor] for i, (_, _, anchor) in enumerate(parser.titles)
+              if anchor in parser.abstracts}
+    paired.update(zip(leftover, parser.unanchored))
+    if len(parser.unanchored) > len(leftover):
+        print(f"Skipped {len(parser.unanchored) - len(leftover)} abstracts without a matching title")
+    return [{"title": parser.titles[i][0], "abstract": paired[i], "url": parser.titles[i][1]}
+            for i in sorted(paired)]
+
+
+def save_page(pages_dir: Path, url: str, html: str) -> None:
+    """Keep a copy of a fetched page under its URL path (a local mirror of the site)."""
+    path = pages_dir / urlsplit(url).path.strip("/") / "index.html"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html, encoding="utf-8")
+
+
+def iter_volumes(conference: str, fetcher: Fetcher, base_url: str = BASE_URL,
+                 pages_dir: Path | None = None):
+    """Yield the papers of every volume of `conference`, volume by volume in order."""
+    venue_url = f"{base_url}/venues/{conference}/"
+    venue_html = fetcher.get(venue_url)
+    if pages_dir:
+        save_page(pages_dir, venue_url, venue_html)
+    urls = volume_urls(venue_html, base_url)
+    print(f"Found {len(urls)} volume URLs")
+
+    def handle(volume_url, html):
+        if pages_dir:
+            save_page(pages_dir, volume_url, html)
+        return parse_volume(html)
+
+    # Volumes are fetched and parsed concurrently but yielded in order
+    for volume_url, papers in fetcher.map(handle, urls):
+        print(f"Scraping: {volume_url}")
+        if isinstance(papers, Exception):
+            print(f"Error scraping {volume_url}: {papers}")
+            continue
+        yield papers
+
+
+def collect(conference: str, fetcher: Fetcher, base_url: str = BASE_URL,
+            pages_dir: Path | None = None) -> list[dict]:
+    """Abstracts of every volume of `conference`, numbered in volume order."""
+    results = []
+    paper_id = 1
+    for papers in iter_volumes(conference, fetcher, base_url, pages_dir):
+        for paper in papers:
+            results.append({"id": paper_id, **paper})
+            paper_id += 1
+    return results
+
+
+def collect_into_store(conference: str, fetcher: Fetcher, store: AbstractStore,
+                       base_url: str = BASE_URL, pages_dir: Path | None = None) -> tuple[int, int]:
+    """
+    Append every volume's new papers to `store` as soon as it is parsed, with
+    ids continuing after the store's last one. Papers whose URL is already
+    in the store (or earlier on the page) are skipped, so re-scrapes only add
+    what is new; papers without a URL are matched on (title, abstract)
+    instead. Returns (added, skipped).
+    """
+    # papers without a URL have no other stable key
+    no_url = {(r["title"], r["abstract"]) for r in store.read(store.ids_with_url("No URL"))}
+    added = skipped = 0
+    for papers in iter_volumes(conference, fetcher, base_url, pages_dir):
+        new, urls = [], set()
+        for paper in papers:
+            url = paper["url"]
+            if url == "No URL":
+                key = (paper["title"], paper["abstract"])
+                if key not in no_url:
+                    no_url.add(key)
+                    new.append(paper)
+            elif url not in urls and not store.has_url(url):
+                urls.add(url)
+                new.append(paper)
+        first_id = store.next_id
+        added += store.append([{"id": first_id + i, **paper} for i, paper in enumerate(new)])
+        skipped += len(papers) - len(new)
+    return added, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape abstracts from ACL Anthology conferences.")
+    parser.add_argument("conference", type=str, help="Conference acronym (e.g., lrec, cl, wmt, ranlp, conll).")
+    parser.add_argument("--output", type=str, default=None, help="Output JSON (default: <conference>_abstracts.json).")
+    parser.add_argument("--workers", type=int, default=4, help="Volume pages fetched concurrently.")
+    parser.add_argument("--rate", type=float, default=1.0, help="Max requests per second to the host (0 = unlimited).")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Directory for cached pages, revalidated with ETag/Last-Modified (opt-in).")
+    parser.add_argument("--base-url", type=str, default=BASE_URL,
+                        help="Site to fetch from, e.g. a local server with saved pages.")
+    parser.add_argument("--save-pages", type=str, default=None, help="Also save every fetched page under this directory.")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Append to this JSONL abstract store, volume by volume, instead of writing --output.")
+    args = parser.parse_args()
+    conference = args.conference.lower()
+
+    start = time.perf_counter()
+    cache = HttpCache(args.cache_dir) if args.cache_dir else None
+    pages_dir = Path(args.save_pages) if args.save_pages else None
+    with Fetcher(workers=args.workers, rate=args.rate, cache=cache) as fetcher:
+        if args.store:
+            store = AbstractStore(args.store)
+            added, skipped = collect_into_store(conference, fetcher, store, args.base_url.rstrip("/"), pages_dir)
+            print(f"\nFinished. Added {added} abstracts to {args.store} ({len(store)} in total, "
+                  f"{skipped} already stored skipped) in {time.perf_counter() - start:.1f}s.")
+        else:
+            results = collect(conference, fetcher, args.base_url.rstrip("/"), pages_dir)
+
+            # Save results to JSON
+            output = args.output or f"{conference}_abstracts.json"
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+            print(f"\nFinished. Collected {len(results)} abstracts in {time.perf_counter() - start:.1f}s.")
+    if cache is not None:
+        print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
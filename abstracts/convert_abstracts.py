@@ -0,0 +1,53 @@
+# Convert between the abstract JSON files and the JSONL abstract store.
+# Usage: python3 convert_abstracts.py to-jsonl <abstracts.json> [more.json ...] <store.jsonl>
+#        python3 convert_abstracts.py to-json <store.jsonl> <abstracts.json> [--ids 1-2500] [--ascii]
+#        python3 convert_abstracts.py reindex <store.jsonl>
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import os
+
+from AbstractStore import AbstractStore, json_to_store, store_to_json
+
+
+def parse_ids(spec: str) -> set:
+    """"1-2500,3000,3100-3200" -> set of ids."""
+    ids = set()
+    for part in spec.split(","):
+        lo, _, hi = part.strip().partition("-")
+        ids.update(range(int(lo), int(hi or lo) + 1))
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert abstract JSON files to and from a JSONL abstract store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    to_jsonl = sub.add_parser("to-jsonl", help="Append JSON abstract files to a store (records with ids already in it are skipped).")
+    to_jsonl.add_argument("inputs", nargs="+", help="Abstract JSON files.")
+    to_jsonl.add_argument("store", help="JSONL store to create or append to.")
+    to_json = sub.add_parser("to-json", help="Write a store (or some ids of it) as an abstract JSON file.")
+    to_json.add_argument("store", help="JSONL store.")
+    to_json.add_argument("output", help="Abstract JSON file to write.")
+    to_json.add_argument("--ids", type=str, default=None, help="Only these ids, e.g. 1-2500,3000.")
+    to_json.add_argument("--ascii", action="store_true", help="Escape non-ASCII characters.")
+    reindex = sub.add_parser("reindex", help="Rebuild the .idx file of a store from its data.")
+    reindex.add_argument("store", help="JSONL store.")
+    args = parser.parse_args()
+
+    if args.command == "to-jsonl":
+        for path in args.inputs:
+            store, skipped = json_to_store(path, args.store)
+            print(f"{path} -> {args.store} ({len(store)} records, {skipped} duplicate ids skipped)")
+    elif args.command == "to-json":
+        count = store_to_json(args.store, args.output, parse_ids(args.ids) if args.ids else None,
+                              args.ascii)
+        print(f"{args.store} -> {args.output} ({count} records)")
+    else:
+        if os.path.exists(args.store + ".idx"):
+            os.remove(args.store + ".idx")
+        store = AbstractStore(args.store, create=False)
+        print(f"indexed {len(store)} records of {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Local stand-in for aclanthology.org: serves saved venue and volume pages
+# (abstract_collector.py --save-pages DIR, or a mirror rendered from an
+# abstracts JSON) with ETag / Last-Modified, 304 answers and optional latency.
+# Usage: python3 benchmarks/anthology_server.py <pages_dir> [--port 8000] [--latency 0.2]
+#        python3 benchmarks/anthology_server.py <pages_dir> --render abstracts/cl_abstracts.json --venue cl
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import email.utils
+import hashlib
+import html
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def volume_of(paper_id: str) -> str:
+    # 2020.cl-1.1 -> 2020.cl-1; old-style ids (J78-4001) are grouped by all but the last 3 digits
+    return paper_id.rsplit(".", 1)[0] if "." in paper_id else paper_id[:-3]
+
+
+def render_site(abstracts: list[dict], pages_dir: Path, venue: str,
+                front_matter: bool = False) -> list[str]:
+    """
+    Write a venue page and one volume page per volume in the ACL Anthology
+    markup the collector parses. With `front_matter`, every volume starts
+    with a title-only entry that has no abstract, as on the real site.
+    Returns the volume ids.
+    """
+    volumes = defaultdict(list)
+    for entry in abstracts:
+        paper_id = entry["url"].rstrip("/").rsplit("/", 1)[-1]
+        volumes[volume_of(paper_id)].append((paper_id, entry))
+
+    for volume, papers in volumes.items():
+        blocks = []
+        if front_matter:
+            blocks.append(f'<p class="d-sm-flex align-items-stretch"><span class="d-block">'
+                          f'<strong><a class="align-middle" href="/volumes/{volume}/">'
+                          f'Proceedings of {volume}</a></strong></span></p>\n')
+        for paper_id, entry in papers:
+            anchor = "abstract-" + paper_id.replace("-", "--").replace(".", "--")
+            blocks.append(
+                f'<p class="d-sm-flex align-items-stretch">'
+                f'<span class="d-block mr-2 text-nowrap list-button-row">'
+                f'<a class="badge badge-primary align-middle mr-1" href="https://aclanthology.org/{paper_id}.pdf">pdf</a> '
+                f'<a class="badge badge-info align-middle mr-1" href="#{anchor}" data-toggle="collapse" '
+                f'aria-expanded="false" aria-controls="{anchor}" title="Show Abstract">abs</a></span>'
+                f'<span class="d-block"><strong><a class="align-middle" href="/{paper_id}/">'
+                f'{html.escape(entry["title"])}</a></strong><br>'
+                f'<a href="/people/a/author/">An Author</a></span></p>\n'
+                f'<div class="card bg-light mb-2 mb-lg-3 collapse abstract-collapse" id="{anchor}">'
+                f'<div class="card-body p-3 small">{html.escape(entry["abstract"])}</div></div>\n')
+        page = (f"<!doctype html><html lang=en-us><head><title>{volume} - ACL Anthology</title></head>"
+                f'<body><div class="container"><h2>{volume}</h2>\n{"".join(blocks)}</div></body></html>\n')
+        path = pages_dir / "volumes" / volume / "index.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(page, encoding="utf-8")
+
+    links = "".join(f'<li><a href="/volumes/{v}/">{v}</a></li>\n' for v in volumes)
+    path = pages_dir / "venues" / venue / "index.html"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"<!doctype html><html><body><ul>\n{links}</ul></body></html>\n", encoding="utf-8")
+    return list(volumes)
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    pages_dir: Path
+    latency = 0.0
+    stats = None  # dict of counters shared by the server's threads
+    lock = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        path = self.pages_dir / self.path.split("?")[0].strip("/") / "index.html"
+        if not path.is_file():
+            self._count("not_found", 0)
+            self.send_error(404)
+            return
+        body = path.read_bytes()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        mtime = int(path.stat().st_mtime)
+        if self._unchanged(etag, mtime):
+            self._count("not_modified", 0)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._count("ok", len(body))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(mtime, usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _unchanged(self, etag: str, mtime: int) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if "If-None-Match" in self.headers:
+            return etag in [t.strip() for t in self.headers["If-None-Match"].split(",")]
+        since = self.headers.get("If-Modified-Since")
+        if since:
+            try:
+                return mtime <= email.utils.parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _count(self, key: str, size: int) -> None:
+        with self.lock:
+            self.stats[key] += 1
+            self.stats["bytes"] += size
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(pages_dir: str | Path, port: int = 0, latency: float = 0.0):
+    """Start serving `pages_dir` in a background thread; returns (server, base_url, stats)."""
+    stats = defaultdict(int)
+    handler = type("Handler", (PageHandler,), {"pages_dir": Path(pages_dir), "latency": latency,
+                                               "stats": stats, "lock": threading.Lock()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved ACL Anthology pages locally.")
+    parser.add_argument("pages_dir", help="Directory of saved pages (<path>/index.html).")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument("--render", type=str, default=None,
+                        help="First render pages_dir from this abstracts JSON (needs --venue).")
+    parser.add_argument("--venue", type=str, default=None, help="Venue acronym of the rendered pages.")
+    parser.add_argument("--front-matter", action="store_true",
+                        help="Start every rendered volume with an entry that has no abstract.")
+    args = parser.parse_args()
+
+    if args.render:
+        if not args.venue:
+            parser.error("--render needs --venue")
+        with open(args.render, encoding="utf-8") as f:
+            volumes = render_site(json.load(f), Path(args.pages_dir), args.venue.lower(),
+                                  args.front_matter)
+        print(f"rendered {len(volumes)} volume pages into {args.pages_dir}")
+
+    server, base_url, _ = serve(args.pages_dir, args.port, args.latency)
+    print(f"serving {args.pages_dir} at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
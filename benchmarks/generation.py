@@ -0,0 +1,77 @@
+# Benchmark RQ generation throughput: one abstract at a time against
+# length-bucketed batches, on CPU. Without --model a tiny random Llama model
+# (with a tokenizer trained on the abstracts) is built, so no GPU or model
+# download is needed.
+# Usage: python3 benchmarks/generation.py <abstracts.json> <prompts_file> [--limit 64] [--batch-sizes 1 8 16]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "models"))
+from Generation import BatchedGenerator, generate_rqs, load_model, select_abstracts
+
+
+def build_tiny_model(texts: list[str], out_dir: str, vocab_size: int = 2000) -> str:
+    """Save a randomly initialised 2-layer Llama and a BPE tokenizer to `out_dir`."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    tok = Tokenizer(models.BPE(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    tok.train_from_iterator(texts, trainers.BpeTrainer(
+        vocab_size=vocab_size, special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="<unk>",
+                                        bos_token="<s>", eos_token="</s>")
+    tokenizer.save_pretrained(out_dir)
+
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128,
+                         num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+                         max_position_embeddings=4096, bos_token_id=1, eos_token_id=2)
+    LlamaForCausalLM(config).save_pretrained(out_dir)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generation throughput: sequential vs length-bucketed batches.")
+    parser.add_argument("input_file", help="Abstracts JSON file.")
+    parser.add_argument("prompts_file", help="Prompt template file.")
+    parser.add_argument("--model", default=None, help="Model name or path (default: tiny random Llama).")
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--limit", type=int, default=64, help="Number of abstracts.")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--max-batch-tokens", type=int, default=65536)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16])
+    args = parser.parse_args()
+
+    with open(args.input_file, encoding="utf-8") as f:
+        abstracts = json.load(f)
+    with open(args.prompts_file, encoding="utf-8") as f:
+        prompt_template = f.read().strip()
+    entries = select_abstracts(abstracts, set(range(1, 2501)))[:args.limit]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_name = args.model or build_tiny_model([e["abstract"] for e in abstracts], tmp)
+        tokenizer, model = load_model(model_name, args.dtype)
+
+        baseline = None
+        print(f"{'batch':>6} {'abstracts/s':>12} {'tokens/s':>10} {'same rows':>10}")
+        for batch_size in args.batch_sizes:
+            generator = BatchedGenerator(tokenizer, model, max_new_tokens=args.max_new_tokens,
+                                         max_batch_size=batch_size,
+                                         max_batch_tokens=args.max_batch_tokens)
+            rows, stats = generate_rqs(generator, entries, prompt_template, number_re=r'^\s*["\']?\d+[\.\)]?\s*')
+            baseline = rows if baseline is None else baseline
+            print(f"{batch_size:>6} {stats['abstracts_per_sec']:>12.2f} {stats['tokens_per_sec']:>10.1f} "
+                  f"{str(rows == baseline):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Compare start-up time and memory of the full en_core_web_sm pipeline with the
+# trimmed, lazily loaded pipeline used by ChunkingLib.
+# Usage: python3 benchmarks/nlp_load.py <input_rqs.csv> [--docs N] [--model NAME_OR_PATH] [--repeat 3]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter per mode so RSS numbers don't leak between modes
+CHILD = r"""
+import csv, json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+mode, csv_path, n_docs, model = sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5]
+
+def rss_mb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+t0 = time.perf_counter()
+import ChunkingLib
+t_import = time.perf_counter() - t0
+ChunkingLib.MODEL_NAME = model
+rss_start = rss_mb()
+
+# spaCy's own import (thinc, and torch where installed) is the same in both modes
+t0 = time.perf_counter()
+import spacy
+t_spacy = time.perf_counter() - t0
+rss_spacy = rss_mb()
+
+t0 = time.perf_counter()
+if mode == "full":
+    nlp = spacy.load(ChunkingLib.MODEL_NAME)
+else:
+    nlp = ChunkingLib.get_nlp()
+t_load = time.perf_counter() - t0
+rss_loaded = rss_mb()
+
+with open(csv_path, newline="", encoding="utf-8") as fh:
+    questions = [r["research_question"] for r in csv.DictReader(fh)
+                 if r.get("research_question")][:n_docs]
+half = len(questions) // 2
+
+# the first half warms up the allocator; per-doc memory is the growth over the second half
+t0 = time.perf_counter()
+docs = list(nlp.pipe(questions[:half]))
+rss_half = rss_mb()
+docs += nlp.pipe(questions[half:])
+t_parse = time.perf_counter() - t0
+rss_parsed = rss_mb()
+
+print(json.dumps({
+    "mode": mode,
+    "components": nlp.pipe_names,
+    "import_s": t_import,
+    "spacy_import_s": t_spacy,
+    "load_s": t_load,
+    "rss_start_mb": rss_start,
+    "rss_spacy_mb": rss_spacy,
+    "rss_loaded_mb": rss_loaded,
+    "model_mb": rss_loaded - rss_spacy,
+    "parse_docs_per_s": len(docs) / t_parse if t_parse else 0.0,
+    "kb_per_doc": (rss_parsed - rss_half) * 1024 / max(len(docs) - half, 1),
+    "serialized_kb_per_doc": sum(len(d.to_bytes()) for d in docs) / 1024 / max(len(docs), 1),
+}))
+"""
+
+
+def run_mode(mode: str, csv_path: str, n_docs: int, model: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(REPO_DIR), mode, csv_path, str(n_docs), model],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full vs trimmed spaCy pipeline start-up and memory.")
+    parser.add_argument("input_rqs", type=str, help="CSV file with a research_question column.")
+    parser.add_argument("--docs", type=int, default=1000, help="Number of questions to parse.")
+    parser.add_argument("--model", type=str, default="en_core_web_sm",
+                        help="Installed pipeline name or path (default: en_core_web_sm).")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-interpreter runs per mode.")
+    args = parser.parse_args()
+
+    # modes alternate so drift on the machine hits both; the median run is reported
+    runs = {"full": [], "trimmed": []}
+    for _ in range(args.repeat):
+        for mode in runs:
+            runs[mode].append(run_mode(mode, args.input_rqs, args.docs, args.model))
+    results = [{key: (statistics.median(r[key] for r in rs) if isinstance(rs[0][key], float) else rs[0][key])
+                for key in rs[0]} for rs in runs.values()]
+
+    print(f"{'':24}{'full':>14}{'trimmed':>14}   (median of {args.repeat} runs)")
+    for key in ("import_s", "spacy_import_s", "load_s", "rss_start_mb", "rss_spacy_mb", "rss_loaded_mb",
+                "model_mb", "parse_docs_per_s", "kb_per_doc", "serialized_kb_per_doc"):
+        print(f"{key:24}{results[0][key]:>14.3f}{results[1][key]:>14.3f}")
+    for r in results:
+        print(f"{r['mode']} components: {', '.join(r['components'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Benchmark protected-prefix lookup: the old linear startswith scan against the
+# word-level trie in ChunkingLib, as the pattern list grows.
+# Usage: python3 benchmarks/prefix_trie.py <input_rqs.csv> [--sizes 100 1000 10000 50000]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import csv
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import ChunkingLib
+
+
+def linear_prefix_end_index(question: str, patterns: list[str]) -> int | None:
+    """The previous implementation, kept here as the reference."""
+    q_lc = question.strip().lower()
+    for pat in patterns:
+        if q_lc.startswith(pat + " "):
+            return len(pat)
+        elif q_lc.startswith(pat) and len(q_lc) == len(pat):
+            return len(pat)
+    return None
+
+
+def synthetic_patterns(base: list[str], questions: list[str], size: int, seed: int = 42) -> list[str]:
+    """Grow the mined pattern list to `size` with 3-5 word n-grams from the questions."""
+    rng = random.Random(seed)
+    words = [q.lower().split() for q in questions if q.split()]
+    patterns = list(dict.fromkeys(base))[:size]
+    seen = set(patterns)
+    while len(patterns) < size:
+        ws = rng.choice(words)
+        n = rng.randint(3, 5)
+        start = 0 if rng.random() < 0.5 else rng.randint(0, max(len(ws) - n, 0))
+        pat = " ".join(ws[start:start + n])
+        if pat and pat not in seen:
+            seen.add(pat)
+            patterns.append(pat)
+    return patterns
+
+
+def time_per_lookup(fn, questions: list[str]) -> float:
+    t0 = time.perf_counter()
+    for q in questions:
+        fn(q)
+    return (time.perf_counter() - t0) / len(questions) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark linear vs trie prefix matching.")
+    parser.add_argument("input_rqs", type=str, help="CSV file with a research_question column.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    args = parser.parse_args()
+
+    with open(args.input_rqs, newline="", encoding="utf-8") as fh:
+        questions = [r["research_question"] for r in csv.DictReader(fh) if r.get("research_question")]
+
+    base = ChunkingLib._prefix_patterns()
+    print(f"{'patterns':>10}{'linear us/q':>14}{'trie us/q':>12}{'build ms':>10}{'same':>7}")
+    for size in args.sizes:
+        patterns = synthetic_patterns(base, questions, size)
+
+        t0 = time.perf_counter()
+        ChunkingLib._PREFIX_TRIE = ChunkingLib._build_prefix_trie(patterns)
+        build_ms = (time.perf_counter() - t0) * 1e3
+
+        same = all(linear_prefix_end_index(q, patterns) == ChunkingLib._prefix_end_index(q)
+                   for q in questions)
+        linear = time_per_lookup(lambda q: linear_prefix_end_index(q, patterns), questions)
+        trie = time_per_lookup(ChunkingLib._prefix_end_index, questions)
+        print(f"{len(patterns):>10}{linear:>14.2f}{trie:>12.2f}{build_ms:>10.1f}{str(same):>7}")
+
+    ChunkingLib._PREFIX_TRIE = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmark the abstract collector against the local ACL Anthology stand-in:
+# sequential vs concurrent fetching, then a cold and a warm HTTP cache run
+# after one volume page changed. All runs must collect the same abstracts.
+# Usage: python3 benchmarks/scraper.py [--pages DIR --venue cl | --render abstracts/cl_abstracts.json] [--latency 0.2]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root / "abstracts"))
+from Fetcher import Fetcher, HttpCache
+from abstract_collector import collect
+from anthology_server import render_site, serve
+
+
+def timed_collect(venue, base_url, stats, **fetcher_args):
+    stats.clear()
+    start = time.perf_counter()
+    with Fetcher(**fetcher_args) as fetcher:
+        results = collect(venue, fetcher, base_url)
+    return results, time.perf_counter() - start, dict(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent vs cached abstract collection.")
+    parser.add_argument("--pages", type=str, default=None, help="Saved pages (abstract_collector.py --save-pages).")
+    parser.add_argument("--venue", type=str, default="cl", help="Venue to collect.")
+    parser.add_argument("--render", type=str, default=str(root / "abstracts" / "cl_abstracts.json"),
+                        help="Abstracts JSON to render pages from when --pages is not given.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated server latency per request.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Per-host requests/s limit (0 = unlimited).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = Path(args.pages) if args.pages else Path(tmp) / "pages"
+        if not args.pages:
+            with open(args.render, encoding="utf-8") as f:
+                render_site(json.load(f), pages, args.venue)
+        server, base_url, stats = serve(pages, latency=args.latency)
+
+        runs = {}
+        runs["sequential"] = timed_collect(args.venue, base_url, stats, workers=1, rate=args.rate)
+        runs[f"{args.workers} workers"] = timed_collect(args.venue, base_url, stats,
+                                                        workers=args.workers, rate=args.rate)
+        cache_dir = Path(tmp) / "http_cache"
+        runs["cold cache"] = timed_collect(args.venue, base_url, stats, workers=args.workers,
+                                           rate=args.rate, cache=HttpCache(cache_dir))
+        # one volume changes between scrapes
+        volume_page = sorted(pages.glob("volumes/*/index.html"))[0]
+        volume_page.write_text(volume_page.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+        runs["warm cache"] = timed_collect(args.venue, base_url, stats, workers=args.workers,
+                                           rate=args.rate, cache=HttpCache(cache_dir))
+        server.shutdown()
+
+    expected = runs["sequential"][0]
+    print(f"\n{len(expected)} abstracts, {args.latency:.2f}s latency per request")
+    for name, (results, seconds, counts) in runs.items():
+        print(f"{name:>12}: {seconds:6.2f}s  {counts.get('ok', 0)} downloaded "
+              f"({counts.get('bytes', 0) / 1024:.0f} KB), {counts.get('not_modified', 0)} not modified  "
+              f"identical={results == expected}")
+
+
+if __name__ == "__main__":
+    main()
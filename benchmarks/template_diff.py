@@ -0,0 +1,80 @@
+# Diff the single-parse templating (extract_template_with_mapping, which runs
+# the PC rules on the original parse with the EC markers spliced in) against
+# the previous two-parse path that re-parses the EC-marked question, over
+# research question CSVs. Reports mismatch counts and writes the differing rows.
+# Usage: python3 benchmarks/template_diff.py [input_rqs.csv ...] [--model NAME_OR_PATH] [--out diff.csv] [--limit N]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+import ChunkingLib
+from Mappings import (extract_EC_chunks_with_mapping, extract_PC_chunks_with_mapping,
+                      extract_template_with_mapping)
+
+
+def two_pass(question: str):
+    """The previous path: EC pass, then the EC-marked string is parsed again for the PC pass."""
+    marked, mappings = extract_EC_chunks_with_mapping(question)
+    return extract_PC_chunks_with_mapping(marked, mappings)
+
+
+def read_questions(path: str, limit: int | None) -> list[str]:
+    with open(path, newline="", encoding="utf-8") as fh:
+        questions = [r["research_question"] for r in csv.DictReader(fh) if r.get("research_question")]
+    return list(dict.fromkeys(questions))[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-parse vs two-parse templating: mismatch count.")
+    parser.add_argument("inputs", nargs="*",
+                        default=[str(root / "research_questions" / "mistral_rqs.csv"),
+                                 str(root / "research_questions" / "llama_rqs.csv")],
+                        help="CSV files with a research_question column.")
+    parser.add_argument("--model", type=str, default=ChunkingLib.MODEL_NAME,
+                        help="Installed pipeline name or path (default: en_core_web_sm).")
+    parser.add_argument("--out", type=str, default=None, help="Write the mismatching rows to this CSV.")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N distinct questions per file.")
+    args = parser.parse_args()
+    ChunkingLib.MODEL_NAME = args.model
+    ChunkingLib.get_nlp()
+
+    diffs = []
+    print(f"{'file':28}{'questions':>10}{'template':>10}{'mapping':>10}{'single s':>10}{'two-pass s':>11}")
+    for path in args.inputs:
+        questions = read_questions(path, args.limit)
+        t = time.perf_counter()
+        single = [extract_template_with_mapping(q) for q in questions]
+        single_s = time.perf_counter() - t
+        t = time.perf_counter()
+        double = [two_pass(q) for q in questions]
+        double_s = time.perf_counter() - t
+
+        template_diff = mapping_diff = 0
+        for q, (tq1, map1), (tq2, map2) in zip(questions, single, double):
+            if tq1 != tq2:
+                template_diff += 1
+            elif map1 != map2:
+                mapping_diff += 1
+            else:
+                continue
+            diffs.append([Path(path).name, q, tq1, tq2, map1, map2])
+        print(f"{Path(path).name:28}{len(questions):>10}{template_diff:>10}{mapping_diff:>10}"
+              f"{single_s:>10.2f}{double_s:>11.2f}")
+
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["file", "research_question", "single_parse", "two_parse",
+                             "single_parse_mapping", "two_parse_mapping"])
+            writer.writerows(diffs)
+        print(f"{len(diffs)} differing rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Benchmark volume page parsing in the abstract collector: the full
+# BeautifulSoup parse with zip pairing it used to do, a SoupStrainer parse of
+# only the title blocks and abstract containers, and the streaming
+# VolumeParser that pairs them by anchor. The saved mixed page in fixtures/
+# (front matter, a title-only talk and one abstract container without an
+# anchor among anchored ones) is checked first.
+# Usage: python3 benchmarks/volume_parsing.py [--pages DIR | --render abstracts/cl_abstracts.json] [--repeat 3]
+# RTSREC001 - Rector Ratsaka
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+root = Path(__file__).resolve().parent.parent
+MIXED_PAGE = Path(__file__).resolve().parent / "fixtures" / "mixed_volume.html"
+sys.path.insert(0, str(root / "abstracts"))
+from abstract_collector import ABSTRACT_CLASS, BASE_URL, TITLE_CLASSES, parse_volume
+from anthology_server import render_site
+
+
+def full_parse_volume(volume_html: str) -> list[dict]:
+    """The previous parse: whole page, titles and abstracts zipped by position."""
+    vsoup = BeautifulSoup(volume_html, "html.parser")
+
+    abstracts = vsoup.find_all("div", class_="card-body p-3 small")
+    titles = vsoup.find_all("p", class_="d-sm-flex align-items-stretch")
+
+    papers = []
+    for abstract, title_block in zip(abstracts, titles):
+        title_tag = title_block.find("strong")
+        link_tag = title_tag.find("a") if title_tag else None
+
+        title = title_tag.text.strip() if title_tag else "No Title"
+        abstract_text = abstract.text.strip()
+        url = BASE_URL + link_tag['href'] if link_tag else "No URL"
+
+        papers.append({"title": title, "abstract": abstract_text, "url": url})
+    return papers
+
+
+def _paper_part(css_class):
+    return css_class is not None and not {ABSTRACT_CLASS, *TITLE_CLASSES}.isdisjoint(css_class.split())
+
+
+def strained_soup(volume_html: str):
+    """Tree of only the title blocks and abstract containers (parse time only, no extraction)."""
+    return BeautifulSoup(volume_html, "html.parser", parse_only=SoupStrainer(class_=_paper_part))
+
+
+def check_mixed_page() -> None:
+    """The anchored abstracts keep their titles; the unanchored one goes to the title whose anchor is missing."""
+    expected = [("2021.wmt-1.1", "Findings of the 2021 Conference on Machine Translation (WMT21)",
+                 "This paper presents the results of the news translation task"),
+                ("2021.wmt-1.2", "Results of the WMT21 Metrics Shared Task",
+                 "This paper presents the results of the WMT21 Metrics Shared Task"),
+                ("2021.wmt-1.4", "Findings of the WMT 2021 Shared Task on Quality Estimation",
+                 "We report the results of the WMT 2021 shared task on Quality Estimation")]
+    papers = parse_volume(MIXED_PAGE.read_text(encoding="utf-8"))
+    got = [(p["url"], p["title"], p["abstract"]) for p in papers]
+    ok = len(got) == len(expected) and all(
+        url == f"{BASE_URL}/{paper_id}/" and title == want_title and abstract.startswith(want_abstract)
+        for (url, title, abstract), (paper_id, want_title, want_abstract) in zip(got, expected))
+    if not ok:
+        raise SystemExit(f"{MIXED_PAGE.name}: unexpected pairing {got}")
+    zipped = full_parse_volume(MIXED_PAGE.read_text(encoding="utf-8"))
+    print(f"{MIXED_PAGE.name}: {len(papers)} papers paired correctly "
+          f"(zip pairing gave {[p['title'][:20] for p in zipped]})")
+
+
+def time_parse(parse, pages: list[str], repeat: int) -> tuple[float, list]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(page) for page in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs strained vs streaming parsing of volume pages.")
+    parser.add_argument("--pages", type=str, default=None,
+                        help="Saved pages (abstract_collector.py --save-pages); volumes/*/index.html are parsed.")
+    parser.add_argument("--render", type=str, default=str(root / "abstracts" / "cl_abstracts.json"),
+                        help="Abstracts JSON to render volume pages (with front matter) from when --pages is not given.")
+    parser.add_argument("--no-front-matter", action="store_true",
+                        help="Render volumes without front matter (both parses then pair identically).")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_mixed_page()
+    with tempfile.TemporaryDirectory() as tmp:
+        pages_dir = Path(args.pages) if args.pages else Path(tmp)
+        if not args.pages:
+            with open(args.render, encoding="utf-8") as f:
+                render_site(json.load(f), pages_dir, "bench", front_matter=not args.no_front_matter)
+        pages = [p.read_text(encoding="utf-8") for p in sorted(pages_dir.glob("volumes/*/index.html"))]
+
+    size_mb = sum(len(p.encode("utf-8")) for p in pages) / (1024 * 1024)
+    full_s, full = time_parse(full_parse_volume, pages, args.repeat)
+    soup_s, _ = time_parse(strained_soup, pages, args.repeat)
+    stream_s, streamed = time_parse(parse_volume, pages, args.repeat)
+
+    full = [paper for page in full for paper in page]
+    streamed = [paper for page in streamed for paper in page]
+    by_url = {paper["url"]: paper for paper in streamed}
+    mispaired = sum(1 for paper in full if by_url.get(paper["url"]) != paper)
+
+    print(f"{len(pages)} volume pages, {size_mb:.1f} MB")
+    print(f"full parse:     {full_s:6.3f}s ({full_s / len(pages) * 1000:.1f} ms/page), {len(full)} papers")
+    print(f"SoupStrainer:   {soup_s:6.3f}s ({soup_s / len(pages) * 1000:.1f} ms/page), tree only")
+    print(f"VolumeParser:   {stream_s:6.3f}s ({stream_s / len(pages) * 1000:.1f} ms/page), {len(streamed)} papers")
+    print(f"speedup: {full_s / stream_s:.2f}x; {mispaired} of the zip-paired papers got another paper's "
+          f"title/URL or a missing abstract")
+
+
+if __name__ == "__main__":
+    main()
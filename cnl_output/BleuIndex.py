@@ -0,0 +1,235 @@
+# Indexed BLEU scoring of test templates against train templates.
+# Computes the same scores as NLTK sentence_bleu / corpus_bleu (weights
+# 0.25 x 4, method1 smoothing) without scoring every (test, train) pair.
+# RTSREC001 - Rector Ratsaka
+
+import bisect
+import math
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+MAX_N = 4
+EPSILON = 0.1  # SmoothingFunction().method1 default
+
+
+def ngram_counts(tokens: List[str], n: int) -> Counter:
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def brevity_penalty(ref_len: int, hyp_len: int) -> float:
+    # nltk.translate.bleu_score.brevity_penalty
+    if hyp_len > ref_len:
+        return 1.0
+    if hyp_len == 0:
+        return 0.0
+    return math.exp(1 - ref_len / hyp_len)
+
+
+def bleu_from_counts(matches: List[int], hyp_len: int, ref_len: int) -> float:
+    """
+    Sentence BLEU from clipped n-gram matches, exactly as NLTK computes it
+    with uniform weights and method1 smoothing (zero counts become
+    EPSILON / denominator; no unigram match at all scores 0).
+    """
+    if not matches[0]:
+        return 0.0
+    logs = []
+    for n, m in enumerate(matches, start=1):
+        denom = max(1, hyp_len - n + 1)
+        p = m / denom if m else EPSILON / denom
+        logs.append(math.log(p) / len(matches))
+    return brevity_penalty(ref_len, hyp_len) * math.exp(math.fsum(logs))
+
+
+class SentenceBleuIndex:
+    """
+    Train templates (the references) with their 1..4-gram counts precomputed
+    once as sparse vectors: every distinct n-gram gets an id, and an inverted
+    index maps the id to the references containing it and how often.
+
+    For a test template, the clipped unigram and bigram matches against all
+    references are accumulated from the postings in a few vectorized steps;
+    references sharing no unigram score 0 and are never touched. The 3- and
+    4-gram precisions are bounded by min(hyp n-grams, ref n-grams), which
+    gives an upper bound per reference; references whose bound cannot beat
+    the best exact score so far are pruned before their 3/4-gram matches
+    are counted.
+    """
+
+    def __init__(self, references: List[List[str]], max_n: int = MAX_N):
+        self.max_n = max_n
+        self.references = references
+        self.ref_lens = np.array([len(r) for r in references], dtype=np.int64)
+        self._ids: List[dict] = [{} for _ in range(max_n)]
+        postings: List[List[Tuple[list, list]]] = [[] for _ in range(max_n)]
+        for ref_id, ref in enumerate(references):
+            for n in range(1, max_n + 1):
+                ids = self._ids[n - 1]
+                for gram, count in ngram_counts(ref, n).items():
+                    gid = ids.get(gram)
+                    if gid is None:
+                        gid = ids[gram] = len(postings[n - 1])
+                        postings[n - 1].append(([], []))
+                    postings[n - 1][gid][0].append(ref_id)
+                    postings[n - 1][gid][1].append(count)
+        self._postings = [[(np.array(r, dtype=np.int64), np.array(c, dtype=np.int64))
+                           for r, c in order] for order in postings]
+
+    def __len__(self) -> int:
+        return len(self.ref_lens)
+
+    def _matches(self, hyp: List[str], n: int, refs: np.ndarray | None = None) -> np.ndarray:
+        """
+        Clipped n-gram matches of `hyp` against every reference, or only
+        against `refs` (a boolean mask) when given.
+        """
+        out = np.zeros(len(self.ref_lens), dtype=np.int64)
+        ids = self._ids[n - 1]
+        for gram, count in ngram_counts(hyp, n).items():
+            gid = ids.get(gram)
+            if gid is None:
+                continue
+            ref_ids, ref_counts = self._postings[n - 1][gid]
+            if refs is not None:
+                keep = refs[ref_ids]
+                ref_ids, ref_counts = ref_ids[keep], ref_counts[keep]
+            out[ref_ids] += np.minimum(ref_counts, count)
+        return out
+
+    def best(self, hyp: List[str]) -> Tuple[float, int]:
+        """(max sentence BLEU of `hyp` over all references, index of that reference)."""
+        c = len(hyp)
+        if c == 0 or len(self.ref_lens) == 0:
+            return 0.0, -1
+        m1 = self._matches(hyp, 1)
+        cand = np.flatnonzero(m1)
+        if len(cand) == 0:
+            return 0.0, -1
+
+        denoms = [max(1, c - n + 1) for n in range(1, self.max_n + 1)]
+        r = self.ref_lens[cand]
+        bp = np.where(c > r, 1.0, np.exp(1 - r / c))
+        log_p = np.log(m1[cand] / denoms[0])
+        if self.max_n >= 2:
+            m2 = self._matches(hyp, 2)[cand]
+            log_p = log_p + np.log(np.where(m2 > 0, m2, EPSILON) / denoms[1])
+        log_ub = log_p.copy()
+        for n in range(3, self.max_n + 1):
+            u = np.minimum(denoms[n - 1], np.maximum(r - n + 1, 0))
+            log_ub += np.log(np.where(u > 0, u, EPSILON) / denoms[n - 1])
+        upper = bp * np.exp(log_ub / self.max_n)
+
+        # exact score of the most promising reference is the bar to beat
+        top = int(cand[np.argmax(upper)])
+        best_score = self.score(hyp, top)
+        alive = upper > best_score * (1 - 1e-12)  # slack for rounding in the bound
+        if not alive.any():
+            return best_score, top
+
+        mask = np.zeros(len(self.ref_lens), dtype=bool)
+        mask[cand[alive]] = True
+        exact = log_p[alive]
+        for n in range(3, self.max_n + 1):
+            m = self._matches(hyp, n, mask)[cand[alive]]
+            exact = exact + np.log(np.where(m > 0, m, EPSILON) / denoms[n - 1])
+        scores = bp[alive] * np.exp(exact / self.max_n)
+        i = int(np.argmax(scores))
+        if scores[i] > best_score:
+            best_id = int(cand[alive][i])
+            # rescore with NLTK's arithmetic so the reported value matches it
+            return self.score(hyp, best_id), best_id
+        return best_score, top
+
+    def score(self, hyp: List[str], ref_id: int) -> float:
+        """Sentence BLEU of `hyp` against reference `ref_id` alone."""
+        ref = self.references[ref_id]
+        matches = []
+        for n in range(1, self.max_n + 1):
+            ref_counts = ngram_counts(ref, n)
+            matches.append(sum(min(count, ref_counts[gram])
+                               for gram, count in ngram_counts(hyp, n).items()))
+        return bleu_from_counts(matches, len(hyp), len(ref))
+
+
+class SharedReferences:
+    """
+    Corpus BLEU against one reference set shared by every hypothesis (what
+    `[train_templates] * len(test_templates)` means to NLTK). The clipping
+    table (max count of each n-gram over all references) and the sorted
+    reference lengths are built once, so each hypothesis is scored in time
+    linear in its own length.
+    """
+
+    def __init__(self, references: List[List[str]], max_n: int = MAX_N):
+        self.max_n = max_n
+        self.max_counts: List[dict] = [{} for _ in range(max_n)]
+        for ref in references:
+            for n in range(1, max_n + 1):
+                table = self.max_counts[n - 1]
+                for gram, count in ngram_counts(ref, n).items():
+                    if count > table.get(gram, 0):
+                        table[gram] = count
+        self.lengths = sorted({len(r) for r in references})
+
+    def closest_ref_length(self, hyp_len: int) -> int:
+        # nltk closest_ref_length: smallest |ref - hyp|, the shorter ref on ties
+        i = bisect.bisect_left(self.lengths, hyp_len)
+        near = self.lengths[max(0, i - 1):i + 1]
+        return min(near, key=lambda ref_len: (abs(ref_len - hyp_len), ref_len))
+
+    def counts(self, hyp: List[str]) -> Tuple[List[int], List[int]]:
+        """Clipped n-gram matches and NLTK denominators (max(1, n-grams)) of `hyp`."""
+        numerators, denominators = [], []
+        for n in range(1, self.max_n + 1):
+            table = self.max_counts[n - 1]
+            grams = ngram_counts(hyp, n)
+            numerators.append(sum(min(count, table.get(gram, 0)) for gram, count in grams.items()))
+            denominators.append(max(1, sum(grams.values())))
+        return numerators, denominators
+
+    def corpus_bleu(self, hypotheses: List[List[str]]) -> float:
+        """nltk corpus_bleu(references * len(hypotheses), hypotheses), method1 smoothing."""
+        p_num = [0] * self.max_n
+        p_den = [0] * self.max_n
+        hyp_lengths = ref_lengths = 0
+        for hyp in hypotheses:
+            num, den = self.counts(hyp)
+            for i in range(self.max_n):
+                p_num[i] += num[i]
+                p_den[i] += den[i]
+            hyp_lengths += len(hyp)
+            ref_lengths += self.closest_ref_length(len(hyp))
+
+        if not p_num[0]:
+            return 0.0
+        weight = 1 / self.max_n
+        s = (weight * math.log(num / den if num else EPSILON / den)
+             for num, den in zip(p_num, p_den))
+        return brevity_penalty(ref_lengths, hyp_lengths) * math.exp(math.fsum(s))
+
+
+# Worker pool (workers share the index built by the parent)
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _best_chunk(hyps):
+    return [_worker_index.best(h) for h in hyps]
+
+
+def max_sentence_bleu(hypotheses: List[List[str]], references: List[List[str]],
+                      workers: int = 1, chunksize: int = 64) -> List[float]:
+    """Max sentence BLEU of every hypothesis over all references, in input order."""
+    index = SentenceBleuIndex(references)
+    if workers <= 1:
+        return [index.best(h)[0] for h in hypotheses]
+    import multiprocessing
+    chunks = [hypotheses[i:i + chunksize] for i in range(0, len(hypotheses), chunksize)]
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(index,)) as pool:
+        return [score for chunk in pool.map(_best_chunk, chunks) for score, _ in chunk]
@@ -2,6 +2,7 @@
 # and backward (last-N words) matching strategies. Save coverage results and matched rows to CSV files.
 # RTSREC001 - Rector Ratsaka
 
+import math
 import re
 import pandas as pd
 from typing import List, Tuple, Dict
@@ -45,13 +46,15 @@ def save_matches_filtered(test_df: pd.DataFrame,
                           matches: pd.Series,
                           matched_train_map: Dict[str, str],
                           extra_col_name: str,
-                          out_path: str):
+                          out_path: str,
+                          extra_cols: Dict[str, pd.Series] | None = None):
     """
     Save only rows where matches == True, with:
       - original test templated_question
       - normalized_template
       - key segment (first/last n words or full)
       - matched_train_template (representative from train)
+      - any extra_cols (e.g. similarity), after the above
     """
     df = test_df.copy()
     df["normalized_template"] = test_df[templ_col].map(normalize_template)
@@ -66,10 +69,12 @@ def save_matches_filtered(test_df: pd.DataFrame,
         return matched_train_map.get(tkey, "")
 
     matched_df["matched_train_template"] = matched_df[extra_col_name].map(map_train)
+    for name, col in (extra_cols or {}).items():
+        matched_df[name] = col
 
     # Keep useful columns only (if present)
     keep_cols = [c for c in [templ_col, "normalized_template", extra_col_name,
-                             "matched_train_template"] if c in matched_df.columns]
+                             "matched_train_template", *(extra_cols or {})] if c in matched_df.columns]
     matched_df[keep_cols].to_csv(out_path, index=False)
 
 # Core coverage
@@ -95,11 +100,231 @@ def coverage_last_n(train_series: pd.Series, test_series: pd.Series, n: int) ->
     matches = test_keys.map(lambda k: k in train_map)
     return matches, test_keys, train_map
 
+# ---------- Multi-level index ----------
+class _TokenTrie:
+    """
+    Trie over token ids, stored as a flat (node, token) -> node dict.
+    `through[node]` is the first template whose path passes the node and
+    `ending[node]` the first one that ends exactly there (-1 if none).
+    """
+
+    def __init__(self):
+        self.children: Dict[Tuple[int, int], int] = {}
+        self.through: List[int] = [-1]
+        self.ending: List[int] = [-1]
+
+    def insert(self, ids: List[int], rep: int):
+        node = 0
+        for tok in ids:
+            child = self.children.get((node, tok))
+            if child is None:
+                child = len(self.through)
+                self.children[(node, tok)] = child
+                self.through.append(rep)
+                self.ending.append(-1)
+            node = child
+        if node and self.ending[node] < 0:
+            self.ending[node] = rep
+
+    def path(self, ids: List[int], depth: int) -> List[int]:
+        """Nodes along `ids`, at most `depth` of them, up to the first miss."""
+        nodes, node = [], 0
+        for tok in ids[:depth]:
+            node = self.children.get((node, tok))
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def lookup(self, nodes: List[int], length: int, n: int) -> int:
+        """
+        Representative for the first-n key of a template of `length` tokens
+        whose path is `nodes`: a key of n tokens can be matched by any longer
+        template, a shorter (whole-template) key only by an identical one.
+        """
+        if length >= n:
+            return self.through[nodes[n - 1]] if len(nodes) >= n else -1
+        if length and len(nodes) == length:
+            return self.ending[nodes[-1]]
+        return -1
+
+
+class CoverageIndex:
+    """
+    Train templates normalized and tokenized once into token-id arrays, with
+    a prefix trie and a suffix trie over them. `match_levels` answers every
+    first-N and last-N level for a test series in one walk per template, with
+    the same matches and representatives as coverage_first_n/coverage_last_n.
+    """
+
+    def __init__(self, train_series: pd.Series, max_n: int | None = None):
+        self.templates = list(train_series.dropna().map(normalize_template).unique())
+        self.full = {t: t for t in self.templates if t}
+        self.max_n = max_n
+        self._vocab: Dict[str, int] = {}
+        self._prefix = _TokenTrie()
+        self._suffix = _TokenTrie()
+        for i, t in enumerate(self.templates):
+            ids = [self._vocab.setdefault(w, len(self._vocab)) for w in t.split()]
+            # past max_n tokens only the max_n-token prefix/suffix can ever match
+            self._prefix.insert(ids[:max_n] if max_n else ids, i)
+            self._suffix.insert((ids[::-1])[:max_n] if max_n else ids[::-1], i)
+
+    def encode(self, text: str) -> List[int]:
+        return [self._vocab.get(w, -1) for w in text.split()]
+
+    def match_levels(self, test_keys: pd.Series,
+                     forward_levels: List[int] = (),
+                     backward_levels: List[int] = ()) -> Dict[Tuple[str, int], List[int]]:
+        """
+        For normalized test templates, return {(direction, n): representatives},
+        direction "forward" or "backward", with one train template index per
+        test row (-1 where the level has no match).
+        """
+        depth = max(list(forward_levels) + list(backward_levels), default=0)
+        if self.max_n and depth > self.max_n:
+            raise ValueError(f"index was built for levels up to {self.max_n}")
+        out = {("forward", n): [] for n in forward_levels}
+        out.update({("backward", n): [] for n in backward_levels})
+        for text in test_keys:
+            ids = self.encode(text)
+            fwd = self._prefix.path(ids, depth) if forward_levels else []
+            bwd = self._suffix.path(ids[::-1], depth) if backward_levels else []
+            for n in forward_levels:
+                out[("forward", n)].append(self._prefix.lookup(fwd, len(ids), n))
+            for n in backward_levels:
+                out[("backward", n)].append(self._suffix.lookup(bwd, len(ids), n))
+        return out
+
+    def level_result(self, test_keys: pd.Series, reps: List[int],
+                     key_fn) -> Tuple[pd.Series, pd.Series, Dict[str, str]]:
+        """(matches, keys, train_map) for one level, as returned by coverage_first_n."""
+        matches = pd.Series([r >= 0 for r in reps], index=test_keys.index, dtype=bool)
+        keys = test_keys.map(key_fn)
+        train_map = {k: self.templates[r] for k, r in zip(keys, reps) if r >= 0}
+        return matches, keys, train_map
+
+
+# ---------- Approximate (near-match) index ----------
+def template_shingles(text: str, ngram: int = 2) -> List[Tuple[str, int]]:
+    """
+    Word n-grams of a normalized template, padded with start/end markers.
+    Repeated n-grams are numbered so the Jaccard similarity counts them
+    (e.g. "EC EC EC" vs "EC EC").
+    """
+    words = ["<s>"] + text.split() + ["</s>"]
+    seen: Dict[str, int] = {}
+    out = []
+    for i in range(max(1, len(words) - ngram + 1)):
+        gram = " ".join(words[i:i + ngram])
+        seen[gram] = seen.get(gram, 0) + 1
+        out.append((gram, seen[gram]))
+    return out
+
+
+def token_edit_similarity(a: List[str], b: List[str]) -> float:
+    """1 - word-level Levenshtein distance / length of the longer template."""
+    if not a and not b:
+        return 1.0
+    prev = list(range(len(b) + 1))
+    for i, wa in enumerate(a, 1):
+        cur = [i]
+        for j, wb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (wa != wb)))
+        prev = cur
+    return 1.0 - prev[-1] / max(len(a), len(b))
+
+
+class NearTemplateIndex:
+    """
+    Inverted index over the n-gram shingles of the normalized train templates,
+    for nearest-template search down to `min_threshold`. The similarity of
+    two templates is the lower of their shingle Jaccard and their word edit
+    similarity: shingle sets ignore where each n-gram sits ("How can EC be
+    PC EC of EC in EC?" and "How can EC of EC be PC EC in EC?" have the same
+    bigrams), so only an identical template scores 1.0.
+    Shingles are ordered rarest first and only each set's prefix is indexed
+    (prefix filtering): two sets with Jaccard >= t always share a shingle in
+    their prefixes of length |x| - ceil(t*|x|) + 1, so the frequent shingles
+    (like "EC PC") never produce candidates. The similarity is never above
+    the Jaccard, so no template reaching `min_threshold` is missed, and
+    candidates are scored exactly, so results do not depend on hashing or
+    sampling.
+    """
+
+    def __init__(self, train_series: pd.Series, min_threshold: float = 0.5, ngram: int = 2):
+        if not 0.0 < min_threshold <= 1.0:
+            raise ValueError("min_threshold must be in (0, 1]")
+        self.templates = [t for t in train_series.dropna().map(normalize_template).unique() if t]
+        self.min_threshold = min_threshold
+        self.ngram = ngram
+        sets = [set(template_shingles(t, ngram)) for t in self.templates]
+        df: Dict[Tuple[str, int], int] = {}
+        for sh in sets:
+            for g in sh:
+                df[g] = df.get(g, 0) + 1
+        # global order: rare shingles first, ties broken by the shingle itself
+        self._rank = {g: r for r, g in enumerate(sorted(df, key=lambda g: (df[g], g)))}
+        self._sets = sets
+        self._postings: Dict[int, List[int]] = {}
+        for i, sh in enumerate(sets):
+            for r in self._ordered(sh)[:self._prefix_len(len(sh))]:
+                self._postings.setdefault(r, []).append(i)
+
+    def _prefix_len(self, size: int) -> int:
+        return size - math.ceil(self.min_threshold * size - 1e-9) + 1
+
+    def _ordered(self, shingles) -> List[int]:
+        # shingles unseen in train rank first (-1); they cannot produce candidates
+        return sorted(self._rank.get(g, -1) for g in shingles)
+
+    def nearest(self, text: str) -> Tuple[int, float]:
+        """(train template index, similarity) of the most similar train template, or (-1, 0.0)."""
+        words = text.split()
+        x = set(template_shingles(text, self.ngram))
+        lo, hi = self.min_threshold * len(x), len(x) / self.min_threshold
+        best, best_sim = -1, 0.0
+        seen = set()
+        for r in self._ordered(x)[:self._prefix_len(len(x))]:
+            for i in self._postings.get(r, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                y = self._sets[i]
+                if not lo - 1e-9 <= len(y) <= hi + 1e-9:
+                    continue
+                inter = len(x & y)
+                sim = inter / (len(x) + len(y) - inter)
+                if sim < best_sim or sim < self.min_threshold - 1e-9:
+                    continue  # the edit similarity can only lower it
+                sim = min(sim, token_edit_similarity(words, self.templates[i].split()))
+                if sim > best_sim or (sim == best_sim and best >= 0 and i < best):
+                    best, best_sim = i, sim
+        if best_sim < self.min_threshold - 1e-9:
+            return -1, 0.0
+        return best, best_sim
+
+    def nearest_all(self, test_keys: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """Nearest train template and similarity per normalized test template ("" / 0.0 if none)."""
+        memo: Dict[str, Tuple[int, float]] = {}
+        reps, sims = [], []
+        for text in test_keys:
+            if text not in memo:
+                memo[text] = self.nearest(text) if text else (-1, 0.0)
+            i, sim = memo[text]
+            reps.append(self.templates[i] if i >= 0 else "")
+            sims.append(sim)
+        return (pd.Series(reps, index=test_keys.index, dtype=object),
+                pd.Series(sims, index=test_keys.index, dtype=float))
+
+
 # ---------- Runner ----------
 def run_coverage(train_csv: str, test_csv: str,
                  templ_col: str = "templated_question",
                  forward_levels: List[int] = (11, 10, 9, 8, 7, 6, 5),
-                 backward_levels: List[int] = (5, 6, 7, 8, 9, 10, 11)) -> pd.DataFrame:
+                 backward_levels: List[int] = (5, 6, 7, 8, 9, 10, 11),
+                 approx_thresholds: List[float] = (),
+                 approx_ngram: int = 2) -> pd.DataFrame:
 
     train_df = pd.read_csv(train_csv)
     test_df  = pd.read_csv(test_csv)
@@ -110,57 +335,67 @@ def run_coverage(train_csv: str, test_csv: str,
     train_t = train_df[templ_col]
     test_t  = test_df[templ_col]
 
+    # normalize and tokenize each corpus once; every level is answered from the index
+    index = CoverageIndex(train_t)
+    test_keys = test_t.dropna().map(normalize_template)
+    levels = index.match_levels(test_keys, forward_levels, backward_levels)
+    total = len(test_keys)
+
     rows = []
 
     # Full exact (normalized) match — also save only matched rows to CSV
-    full_matches, full_keys, full_map = coverage_exact(train_t, test_t)
+    full_matches = test_keys.map(lambda k: k in index.full)
     matched = int(full_matches.sum())
-    total = len(full_matches)
     pct = (matched / total * 100.0) if total > 0 else 0.0
     rows.append({"match_type": "full_exact", "n_words": None, "matched": matched, "total": total, "coverage_pct": round(pct, 2)})
 
     save_matches_filtered(
         test_df=test_df, templ_col=templ_col,
-        key_series=full_keys, matches=full_matches,
-        matched_train_map=full_map,
+        key_series=test_keys, matches=full_matches,
+        matched_train_map=index.full,
         extra_col_name="full_normalized",
         out_path="full_exact_matches.csv"
     )
 
-    # Forward (first-N words)
-    for n in forward_levels:
-        f_matches, f_keys, f_map = coverage_first_n(train_t, test_t, n)
-        matched = int(f_matches.sum())
-        total = len(f_matches)
-        pct = (matched / total * 100.0) if total > 0 else 0.0
-        rows.append({"match_type": "forward_first_n", "n_words": n, "matched": matched, "total": total, "coverage_pct": round(pct, 2)})
-
-        # Save ONLY for n in {10, 11}, matched rows only
-        if n in (10, 11):
-            save_matches_filtered(
-                test_df=test_df, templ_col=templ_col,
-                key_series=f_keys, matches=f_matches,
-                matched_train_map=f_map,
-                extra_col_name=f"first_{n}_words",
-                out_path=f"forward_first_{n}_matches.csv"
-            )
+    # Forward (first-N words) and backward (last-N words)
+    for match_type, direction, level_list, key_fn, prefix, stem in (
+            ("forward_first_n", "forward", forward_levels, first_n_words, "first", "forward_first"),
+            ("backward_last_n", "backward", backward_levels, last_n_words, "last", "backward_last")):
+        for n in level_list:
+            reps = levels[(direction, n)]
+            matched = sum(r >= 0 for r in reps)
+            pct = (matched / total * 100.0) if total > 0 else 0.0
+            rows.append({"match_type": match_type, "n_words": n, "matched": matched, "total": total, "coverage_pct": round(pct, 2)})
 
-    # Backward (last-N words)
-    for n in backward_levels:
-        b_matches, b_keys, b_map = coverage_last_n(train_t, test_t, n)
-        matched = int(b_matches.sum())
-        total = len(b_matches)
-        pct = (matched / total * 100.0) if total > 0 else 0.0
-        rows.append({"match_type": "backward_last_n", "n_words": n, "matched": matched, "total": total, "coverage_pct": round(pct, 2)})
+            # Save ONLY for n in {10, 11}, matched rows only
+            if n in (10, 11):
+                matches, keys, train_map = index.level_result(test_keys, reps, lambda x: key_fn(x, n))
+                save_matches_filtered(
+                    test_df=test_df, templ_col=templ_col,
+                    key_series=keys, matches=matches,
+                    matched_train_map=train_map,
+                    extra_col_name=f"{prefix}_{n}_words",
+                    out_path=f"{stem}_{n}_matches.csv"
+                )
 
-        # Save ONLY for n in {10, 11}, matched rows only
-        if n in (10, 11):
+    # Approximate: nearest train template by n-gram Jaccard and word edit similarity,
+    # one search per test template
+    if approx_thresholds:
+        near = NearTemplateIndex(train_t, min(approx_thresholds), approx_ngram)
+        near_reps, near_sims = near.nearest_all(test_keys)
+        for t in approx_thresholds:
+            matches = near_sims >= t - 1e-9
+            matched = int(matches.sum())
+            pct = (matched / total * 100.0) if total > 0 else 0.0
+            rows.append({"match_type": "approx_similarity", "n_words": None, "threshold": t,
+                         "matched": matched, "total": total, "coverage_pct": round(pct, 2)})
             save_matches_filtered(
                 test_df=test_df, templ_col=templ_col,
-                key_series=b_keys, matches=b_matches,
-                matched_train_map=b_map,
-                extra_col_name=f"last_{n}_words",
-                out_path=f"backward_last_{n}_matches.csv"
+                key_series=test_keys, matches=matches,
+                matched_train_map=dict(zip(test_keys[matches], near_reps[matches])),
+                extra_col_name="near_normalized",
+                out_path=f"approx_{t:g}_matches.csv",
+                extra_cols={"similarity": near_sims.round(4)}
             )
 
     result_df = pd.DataFrame(rows)
@@ -174,6 +409,20 @@ def run_coverage(train_csv: str, test_csv: str,
     return result_df
 
 if __name__ == "__main__":
-    TRAIN = "mistral_train.csv"
-    TEST  = "mistral_test.csv"
-    run_coverage(TRAIN, TEST)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Coverage of test templates by train templates.")
+    parser.add_argument("train", nargs="?", default="mistral_train.csv", help="Train CNL output CSV.")
+    parser.add_argument("test", nargs="?", default="mistral_test.csv", help="Test CNL output CSV.")
+    parser.add_argument("--max-n", type=int, default=None,
+                        help="Sweep first-N and last-N levels 1..MAX_N (default: 5..11).")
+    parser.add_argument("--approx", type=float, nargs="+", default=(),
+                        help="Also report near-match coverage at these similarity thresholds "
+                             "(min of n-gram Jaccard and word edit similarity), e.g. 0.7 0.8 0.9.")
+    parser.add_argument("--approx-ngram", type=int, default=2, help="Word n-gram size for --approx.")
+    args = parser.parse_args()
+    levels = {}
+    if args.max_n:
+        levels = dict(forward_levels=range(args.max_n, 0, -1),
+                      backward_levels=range(1, args.max_n + 1))
+    run_coverage(args.train, args.test, approx_thresholds=args.approx,
+                 approx_ngram=args.approx_ngram, **levels)
\ No newline at end of file
@@ -1,11 +1,19 @@
 # Analyze the quality of generated templates using corpus BLEU score.
 # RTSREC001 - Rector Ratsaka
 
+import argparse
 import csv
 from nltk.translate.bleu_score import corpus_bleu, SmoothingFunction
 
-# Input file
-input_file = "mistral_templates.csv"
+from BleuIndex import SharedReferences
+
+parser = argparse.ArgumentParser(description="Corpus BLEU of test templates with all train templates as references.")
+parser.add_argument("input_file", nargs="?", default="mistral_templates.csv",
+                    help="CSV with train_templates and test_templates columns.")
+parser.add_argument("--naive", action="store_true",
+                    help="Pass the references to NLTK once per test template (slow; for checking).")
+args = parser.parse_args()
+input_file = args.input_file
 
 # Load templates
 train_templates = []
@@ -26,13 +34,16 @@ smooth = SmoothingFunction().method1
 
 
 # Interpret all train templates as references for every test template
-if test_templates and train_templates:
+if test_templates and train_templates and args.naive:
     references_per_hyp = [train_templates] * len(test_templates)  # multi-reference
     corpus_score = corpus_bleu(
         references_per_hyp,
         test_templates,
         smoothing_function=smooth
     )
+elif test_templates and train_templates:
+    # same score; clipping table and reference lengths are built once
+    corpus_score = SharedReferences(train_templates).corpus_bleu(test_templates)
 else:
     corpus_score = 0.0
 
@@ -1,17 +1,25 @@
 # Analyze the quality of generated templates using sentence BLEU score.
 # RTSREC001 - Rector Ratsaka
 
+import argparse
 import csv
 from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
 
-# Input file
-input_file = "mistral_templates.csv"
+from BleuIndex import max_sentence_bleu
+
+parser = argparse.ArgumentParser(description="Average over test templates of the max sentence BLEU against any train template.")
+parser.add_argument("input_file", nargs="?", default="mistral_templates.csv",
+                    help="CSV with train_templates and test_templates columns.")
+parser.add_argument("--workers", type=int, default=1, help="Processes scoring test templates.")
+parser.add_argument("--naive", action="store_true",
+                    help="Score every (test, train) pair with NLTK (slow; for checking).")
+args = parser.parse_args()
 
 # Load templates
 train_templates = []
 test_templates = []
 
-with open(input_file, newline='', encoding="utf-8") as f:
+with open(args.input_file, newline='', encoding="utf-8") as f:
     reader = csv.DictReader(f)
     for row in reader:
         if row["train_templates"].strip():
@@ -19,15 +27,19 @@ with open(input_file, newline='', encoding="utf-8") as f:
         if row["test_templates"].strip():
             test_templates.append(row["test_templates"].split())
 
-# BLEU smoothing
-smooth = SmoothingFunction().method1
-
-# For each test template, find the highest BLEU against any train template
-max_scores = []
-for idx, te in enumerate(test_templates):
-    scores = [sentence_bleu([tr], te, smoothing_function=smooth) for tr in train_templates]
-    best_score = max(scores)
-    max_scores.append(best_score)
+if args.naive:
+    # BLEU smoothing
+    smooth = SmoothingFunction().method1
+
+    # For each test template, find the highest BLEU against any train template
+    max_scores = []
+    for idx, te in enumerate(test_templates):
+        scores = [sentence_bleu([tr], te, smoothing_function=smooth) for tr in train_templates]
+        best_score = max(scores)
+        max_scores.append(best_score)
+else:
+    # Same scores (NLTK method1 smoothing) from an n-gram index with pruning
+    max_scores = max_sentence_bleu(test_templates, train_templates, workers=args.workers)
 
 # Compute average of the max scores
 average_bleu = sum(max_scores) / len(max_scores) if max_scores else 0.0
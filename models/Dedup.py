@@ -0,0 +1,192 @@
+# Near-duplicate abstract detection before generation (reprints, workshop and
+# main-conference versions of a paper, near-identical abstracts): MinHash
+# signatures of word shingles, LSH banding for candidate pairs, and an exact
+# Jaccard check of each text against the earlier representatives among its
+# candidates, so only one representative per cluster is sent to the model.
+# RTSREC001 - Rector Ratsaka
+
+import csv
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+WORD_RE = re.compile(r"\w+")
+EMPTY = np.uint64(1 << 32)  # above every 32-bit min hash: the signature of an empty set
+# odd 64-bit multipliers mixing the word hashes of a shingle
+MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                0x27D4EB2F165667C5, 0x85EBCA77C2B2AE63], dtype=np.uint64)
+
+
+def shingle_hashes(text: str, k: int = 3, word_hashes: Dict[str, int] | None = None) -> np.ndarray:
+    """
+    Distinct 32-bit hashes of the lowercased word k-grams of `text` (crc32
+    of each word, mixed across the k-gram), sorted. `word_hashes` caches
+    the word hashes across calls.
+    """
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    cache = word_hashes if word_hashes is not None else {}
+    for w in set(words).difference(cache):
+        cache[w] = zlib.crc32(w.encode("utf-8"))
+    ids = np.fromiter(map(cache.__getitem__, words), dtype=np.uint64, count=len(words))
+    n = max(1, len(ids) - k + 1)
+    mixed = np.zeros(n, dtype=np.uint64)
+    for j in range(min(k, len(ids))):
+        mixed ^= ids[j:j + n] * MIX[j % len(MIX)]
+    return np.unique(mixed >> np.uint64(32))
+
+
+def abstract_shingles(text: str, k: int = 3) -> set:
+    return set(shingle_hashes(text, k).tolist())
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows == num_perm whose S-curve midpoint
+    (1 / bands) ** (1 / rows) is the highest one not above `threshold`:
+    candidates are verified exactly, so recall matters more than precision.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    if not below:
+        return max(options, key=lambda o: o[0])
+    return max(below, key=lambda o: (1 / o[0]) ** (1 / o[1]))
+
+
+class MinHasher:
+    """
+    `num_perm` multiply-shift hash functions of 32-bit keys,
+    h(x) = ((a * x + b) mod 2**64) >> 32 with a odd (no modulo by a prime).
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+
+    def signatures(self, shingles: List[np.ndarray], block: int = 1 << 16) -> np.ndarray:
+        """
+        (len(shingles), num_perm) min hashes of shingle hash arrays; the
+        shingles of many texts are hashed together in blocks of about
+        `block` and reduced per text. An empty array gets EMPTY everywhere.
+        """
+        out = np.full((len(shingles), self.num_perm), EMPTY, dtype=np.uint64)
+        start = 0
+        while start < len(shingles):
+            end, size = start, 0
+            while end < len(shingles) and (size == 0 or size + len(shingles[end]) <= block):
+                size += len(shingles[end])
+                end += 1
+            rows = [i for i in range(start, end) if len(shingles[i])]
+            if rows:
+                x = np.concatenate([shingles[i] for i in rows])
+                offsets = np.cumsum([0] + [len(shingles[i]) for i in rows[:-1]])
+                hashed = (self.a * x[None, :] + self.b) >> np.uint64(32)
+                out[rows] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            start = end
+        return out
+
+
+def near_duplicate_clusters(texts: List[str], threshold: float = 0.8, k: int = 3,
+                            num_perm: int = 128, seed: int = 1) -> Tuple[List[int], Dict[str, int]]:
+    """
+    For every text, the position of its cluster's representative (the
+    first text of the cluster; a text that is not a near-duplicate of any
+    earlier representative is its own representative), plus pair counts of
+    the run.
+
+    Texts are taken in order, and each one joins the cluster of the
+    earliest representative whose shingle set has Jaccard similarity >=
+    `threshold` with its own. Every member is therefore within the
+    threshold of its representative (no chains of pairwise links drifting
+    below it). Only texts sharing a whole LSH band of their signatures
+    become candidate pairs, and every candidate is checked exactly, so the
+    clusters have no false positives; a pair can be missed only when no
+    band matches (unlikely well above the S-curve midpoint, see lsh_params).
+    """
+    word_hashes: Dict[str, int] = {}
+    shingles = [shingle_hashes(t, k, word_hashes) for t in texts]
+    sets: Dict[int, set] = {}  # built only for texts in candidate pairs
+
+    def shingle_set(i):
+        if i not in sets:
+            sets[i] = set(shingles[i].tolist())
+        return sets[i]
+
+    hasher = MinHasher(num_perm, seed)
+    bands, rows = lsh_params(num_perm, threshold)
+
+    signatures = hasher.signatures(shingles)
+    earlier: Dict[int, set] = {}  # text -> earlier texts sharing a band with it
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        lo, hi = band * rows, (band + 1) * rows
+        keys = np.ascontiguousarray(signatures[:, lo:hi])
+        for i in range(len(texts)):
+            if len(shingles[i]):
+                buckets.setdefault(keys[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for y in range(1, len(members)):
+                earlier.setdefault(members[y], set()).update(members[:y])
+
+    representative = list(range(len(texts)))
+    counts = {"candidate_pairs": sum(map(len, earlier.values())), "linked_pairs": 0}
+    for i in sorted(earlier):
+        for j in sorted(earlier[i]):
+            if representative[j] == j and jaccard(shingle_set(j), shingle_set(i)) >= threshold:
+                representative[i] = j
+                counts["linked_pairs"] += 1
+                break
+    return representative, counts
+
+
+def dedup_entries(entries: List[dict], threshold: float = 0.8, k: int = 3,
+                  num_perm: int = 128) -> Tuple[List[int], Dict[str, float]]:
+    """
+    Representative position of every abstract entry (see
+    near_duplicate_clusters) and a summary of the generation it saves.
+    """
+    texts = [entry.get("abstract", "").strip() for entry in entries]
+    representative, counts = near_duplicate_clusters(texts, threshold, k, num_perm)
+    duplicates = [i for i, rep in enumerate(representative) if rep != i]
+    words = [len(t.split()) for t in texts]
+    summary = {
+        "abstracts": len(entries),
+        "clusters": len({representative[i] for i in duplicates}),
+        "duplicates": len(duplicates),
+        "duplicate_share": len(duplicates) / len(entries) if entries else 0.0,
+        "word_share": sum(words[i] for i in duplicates) / sum(words) if sum(words) else 0.0,
+        **counts,
+    }
+    return representative, summary
+
+
+def dedup_report(summary: Dict[str, float]) -> str:
+    return (f"near-duplicates: {summary['duplicates']} of {summary['abstracts']} abstracts in "
+            f"{summary['clusters']} clusters are not generated ({summary['duplicate_share']:.1%} of the "
+            f"generations, {summary['word_share']:.1%} of the abstract words); "
+            f"{summary['candidate_pairs']} LSH candidate pairs, {summary['linked_pairs']} within the threshold of their representative")
+
+
+def write_clusters(path: str, entries: List[dict], representative: List[int], k: int = 3) -> None:
+    """CSV of every duplicate with the representative whose RQs it reuses."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["representative_id", "representative_url", "duplicate_id", "duplicate_url",
+                         "jaccard", "representative_title", "duplicate_title"])
+        for i, rep in enumerate(representative):
+            if rep == i:
+                continue
+            a, b = entries[rep], entries[i]
+            similarity = jaccard(abstract_shingles(a.get("abstract", ""), k),
+                                 abstract_shingles(b.get("abstract", ""), k))
+            writer.writerow([a.get("id"), a.get("url", ""), b.get("id"), b.get("url", ""),
+                             f"{similarity:.3f}", a.get("title", ""), b.get("title", "")])
@@ -0,0 +1,406 @@
+# Shared generation code for the model scripts (llama.py, mistral.py):
+# model loading, length-bucketed batched generation (optionally reusing the
+# prompt template's prefilled prefix), RQ line cleaning and checkpointing of
+# finished abstracts.
+# RTSREC001 - Rector Ratsaka
+
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "abstracts"))
+from AbstractStore import read_abstracts  # noqa: E402  (JSON file or JSONL abstract store)
+
+
+def load_model(model_name: str, dtype: str = "bfloat16"):
+    """Tokenizer and causal LM, set up for left-padded batched generation."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.padding_side = "left"  # decoder-only: pad before the prompt
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    kwargs = {"torch_dtype": getattr(torch, dtype)}
+    if torch.cuda.is_available():
+        kwargs["device_map"] = "auto"
+    model = AutoModelForCausalLM.from_pretrained(model_name, **kwargs)
+    model.eval()
+    return tokenizer, model
+
+
+def select_abstracts(abstracts: list, target_ids: set) -> List[dict]:
+    """Entries with a target id and a non-empty abstract, in file order."""
+    return [entry for entry in abstracts
+            if entry.get("id") in target_ids and entry.get("abstract", "").strip()]
+
+
+def length_buckets(lengths: List[int], max_batch_tokens: int, max_batch_size: int,
+                   max_new_tokens: int = 0) -> List[List[int]]:
+    """
+    Group indices into batches of similar length, longest first. A batch is
+    padded to its longest prompt, so it costs len(batch) * (longest prompt +
+    max_new_tokens) tokens; batches are closed before that exceeds
+    `max_batch_tokens` (a single over-long prompt still gets its own batch).
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, batch, width = [], [], 0
+    for i in order:
+        width_i = max(width, lengths[i] + max_new_tokens)
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * width_i > max_batch_tokens):
+            batches.append(batch)
+            batch, width_i = [], lengths[i] + max_new_tokens
+        batch.append(i)
+        width = width_i
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class BatchedGenerator:
+    """
+    Generates responses for many prompts in padded batches. Prompts are
+    sorted by tokenized length and bucketed under a token budget, so little
+    compute goes to padding; results come back keyed by prompt position.
+    A batch that fails (e.g. out of memory) is split and retried, and a
+    single prompt that still fails is reported and skipped.
+
+    With `prefix` (the static text before the abstract in the template), the
+    prefix is tokenized and prefilled once; each batch gets a copy of its
+    past key/values and only prefills the rest of each prompt. Sequences are
+    laid out as [prefix | padding | suffix], and generate() derives position
+    ids from the attention mask, so results equal the uncached path.
+    """
+
+    def __init__(self, tokenizer, model, max_new_tokens: int = 256,
+                 max_batch_size: int = 8, max_batch_tokens: int = 32768,
+                 prefix: str | None = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self.prefix_tokens_reused = 0
+        self._prefix_ids = tokenizer(prefix)["input_ids"] if prefix else None
+        self._prefix_cache = None
+
+    def _prefix_batch(self, prompts: List[str]):
+        """Inputs and a cache copy covering the tokens all prompts share with the prefix."""
+        import torch
+        full = self.tokenizer(prompts)["input_ids"]
+        # a BPE merge across the prefix/abstract boundary can shorten the shared part
+        k = len(self._prefix_ids)
+        for ids in full:
+            k = min(k, next((j for j, (a, b) in enumerate(zip(ids, self._prefix_ids)) if a != b),
+                            min(len(ids), len(self._prefix_ids))))
+        k = min(k, min(len(ids) for ids in full) - 1)  # leave a token to prefill
+        if k <= 0:
+            return None
+        if self._prefix_cache is None:
+            with torch.inference_mode():
+                self._prefix_cache = self.model(
+                    torch.tensor([self._prefix_ids], device=self.model.device),
+                    use_cache=True).past_key_values
+
+        suffixes = [ids[k:] for ids in full]
+        width = max(len(x) for x in suffixes)
+        pad = self.tokenizer.pad_token_id
+        input_ids = [self._prefix_ids[:k] + [pad] * (width - len(x)) + x for x in suffixes]
+        attention = [[1] * k + [0] * (width - len(x)) + [1] * len(x) for x in suffixes]
+        cache = copy.deepcopy(self._prefix_cache)
+        cache.crop(k)
+        cache.batch_repeat_interleave(len(prompts))
+        self.prefix_tokens_reused += k * len(prompts)
+        return {"input_ids": torch.tensor(input_ids, device=self.model.device),
+                "attention_mask": torch.tensor(attention, device=self.model.device),
+                "past_key_values": cache}
+
+    def _generate(self, prompts: List[str]) -> List[str]:
+        import torch
+        enc = self._prefix_batch(prompts) if self._prefix_ids else None
+        if enc is None:
+            enc = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        with torch.inference_mode():
+            out = self.model.generate(**enc, max_new_tokens=self.max_new_tokens,
+                                      pad_token_id=self.tokenizer.pad_token_id)
+        new = out[:, enc["input_ids"].shape[1]:]
+        self.prompt_tokens += int(enc["attention_mask"].sum())
+        self.generated_tokens += int((new != self.tokenizer.pad_token_id).sum())
+        return self.tokenizer.batch_decode(new, skip_special_tokens=True)
+
+    def _run_batch(self, prompts: List[str], ids: list) -> Iterator[Tuple[object, str | None]]:
+        try:
+            yield from zip(ids, self._generate(prompts))
+        except Exception as e:
+            if len(prompts) == 1:
+                print(f"Error processing prompt {ids[0]}: {e}")
+                yield ids[0], None
+                return
+            half = len(prompts) // 2
+            yield from self._run_batch(prompts[:half], ids[:half])
+            yield from self._run_batch(prompts[half:], ids[half:])
+
+    def generate_batches(self, prompts: List[str],
+                         ids: list | None = None) -> Iterator[List[Tuple[object, str | None]]]:
+        """
+        Yield the (id, response) pairs of each batch as it finishes (batches
+        are not in input order); the response is None if generation failed.
+        `ids` default to prompt positions.
+        """
+        ids = list(range(len(prompts))) if ids is None else list(ids)
+        if not prompts:
+            return
+        lengths = [len(x) for x in self.tokenizer(prompts)["input_ids"]]
+        for batch in length_buckets(lengths, self.max_batch_tokens, self.max_batch_size,
+                                    self.max_new_tokens):
+            yield list(self._run_batch([prompts[i] for i in batch], [ids[i] for i in batch]))
+
+    def generate(self, prompts: List[str], ids: list | None = None) -> Iterator[Tuple[object, str | None]]:
+        """Yield (id, response) per prompt, as in generate_batches but flattened."""
+        for batch in self.generate_batches(prompts, ids):
+            yield from batch
+
+    def generate_ordered(self, prompts: List[str]) -> List[str | None]:
+        """Responses in the same order as `prompts`."""
+        results: Dict[int, str | None] = dict(self.generate(prompts))
+        return [results[i] for i in range(len(prompts))]
+
+
+class StubGenerator(BatchedGenerator):
+    """
+    Stand-in for a model in tests and dry runs: each response is two
+    deterministic questions derived from the prompt. `fail_after` raises
+    after that many batches, like a job killed mid-run; `delay` seconds per
+    batch simulate generation time.
+    """
+
+    def __init__(self, max_batch_size: int = 8, fail_after: int | None = None,
+                 delay: float = 0.0):
+        super().__init__(tokenizer=None, model=None, max_new_tokens=0,
+                         max_batch_size=max_batch_size, max_batch_tokens=1 << 62)
+        self.fail_after = fail_after
+        self.delay = delay
+        self.batches = 0
+
+    def generate_batches(self, prompts, ids=None):
+        ids = list(range(len(prompts))) if ids is None else list(ids)
+        for start in range(0, len(prompts), self.max_batch_size):
+            if self.fail_after is not None and self.batches >= self.fail_after:
+                raise RuntimeError(f"stub generator stopped after {self.batches} batches")
+            self.batches += 1
+            if self.delay:
+                time.sleep(self.delay)  # stands in for GPU time; releases the GIL like it
+            batch = []
+            for i in range(start, min(start + self.max_batch_size, len(prompts))):
+                digest = hashlib.sha1(prompts[i].encode("utf-8")).hexdigest()[:8]
+                batch.append((ids[i], f"1. What does study {digest} show?\n2. How long is prompt {len(prompts[i])}?"))
+                self.generated_tokens += 12
+            yield batch
+
+
+class CachedGenerator:
+    """
+    Wraps a generator with a ResponseCache: cached prompts are answered
+    straight away (in batches of the usual size), only the misses go to the
+    model, and each finished batch of new responses is stored. `cache_hits`
+    and `model_calls` count the prompts answered each way.
+    """
+
+    def __init__(self, generator: BatchedGenerator, cache):
+        self.generator = generator
+        self.cache = cache
+        self.cache_hits = 0
+        self.model_calls = 0
+
+    @property
+    def generated_tokens(self) -> int:
+        return self.generator.generated_tokens
+
+    def generate_batches(self, prompts: List[str],
+                         ids: list | None = None) -> Iterator[List[Tuple[object, str | None]]]:
+        ids = list(range(len(prompts))) if ids is None else list(ids)
+        cached = [self.cache.get(p) for p in prompts]
+        hits = [(ids[i], r) for i, r in enumerate(cached) if r is not None]
+        self.cache_hits += len(hits)
+        size = self.generator.max_batch_size
+        for start in range(0, len(hits), size):
+            yield hits[start:start + size]
+
+        missing = [i for i, r in enumerate(cached) if r is None]
+        self.model_calls += len(missing)
+        by_id = {ids[i]: prompts[i] for i in missing}
+        for batch in self.generator.generate_batches([prompts[i] for i in missing],
+                                                     [ids[i] for i in missing]):
+            done = [(by_id[j], r) for j, r in batch if r is not None]
+            self.cache.put_many([p for p, _ in done], [r for _, r in done])
+            yield batch
+
+    def generate(self, prompts: List[str], ids: list | None = None) -> Iterator[Tuple[object, str | None]]:
+        for batch in self.generate_batches(prompts, ids):
+            yield from batch
+
+    def generate_ordered(self, prompts: List[str]) -> List[str | None]:
+        results: Dict[int, str | None] = dict(self.generate(prompts))
+        return [results[i] for i in range(len(prompts))]
+
+
+def generation_settings(model_name: str, model=None, **params) -> dict:
+    """Model name, generation parameters and the model's generation config, for cache keys."""
+    settings = {"model": model_name, **params}
+    if model is not None:
+        config = model.generation_config.to_diff_dict()
+        config.pop("transformers_version", None)
+        settings["generation_config"] = config
+    return settings
+
+
+class Checkpoint:
+    """
+    JSONL progress file of finished abstracts: a header line with the run
+    settings, then one {"id", "rows"} line per abstract, flushed to disk
+    after every batch. With `resume`, finished abstracts are loaded (a torn
+    last line from a killed job is cut off) and the settings must match;
+    otherwise the file is started afresh.
+    """
+
+    def __init__(self, path: str, settings: dict, resume: bool = False):
+        self.path = path
+        self.done: Dict[object, List[dict]] = {}
+        if resume and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            # drop a torn last line so new records start on a line of their own
+            data = data[:data.rfind(b"\n") + 1]
+            with open(path, "r+b") as f:
+                f.truncate(len(data))
+            lines = data.decode("utf-8").splitlines()
+            header = json.loads(lines[0]) if lines else {}
+            if header.get("settings") != settings:
+                raise SystemExit(f"{path} was written with other settings "
+                                 f"({header.get('settings')}); rerun without --resume")
+            for line in lines[1:]:
+                record = json.loads(line)
+                self.done[record["id"]] = record["rows"]
+            self._fh = open(path, "a", encoding="utf-8")
+        else:
+            self._fh = open(path, "w", encoding="utf-8")
+            self._fh.write(json.dumps({"settings": settings}) + "\n")
+            self.sync()
+
+    def record(self, entry_id, rows: List[dict]) -> None:
+        self.done[entry_id] = rows
+        self._fh.write(json.dumps({"id": entry_id, "rows": rows}) + "\n")
+
+    def sync(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def template_prefix(prompt_template: str) -> str:
+    """The static text of `prompt_template` before the abstract."""
+    marker = "\0"
+    return prompt_template.format(abstract=marker).split(marker)[0]
+
+
+def prompt_settings(model_name: str, prompt_template: str, max_new_tokens: int) -> dict:
+    """What a checkpoint must agree on before its rows can be reused."""
+    return {"model": model_name,
+            "prompt_sha1": hashlib.sha1(prompt_template.encode("utf-8")).hexdigest(),
+            "max_new_tokens": max_new_tokens}
+
+
+def clean_rq_lines(response: str, number_re: str) -> List[str]:
+    """Non-empty response lines with leading numbering and quotes removed."""
+    lines = []
+    for line in response.strip().split("\n"):
+        clean_line = re.sub(number_re, "", line).strip(' "\'\n')
+        if clean_line:
+            lines.append(clean_line)
+    return lines
+
+
+def stream_rqs(generator: BatchedGenerator, entries: List[dict], prompt_template: str,
+               number_re: str,
+               checkpoint: Checkpoint | None = None) -> Iterator[List[Tuple[int, List[dict] | None]]]:
+    """
+    Yield, per finished batch, (entry position, RQ rows) for its abstracts;
+    rows are None where generation failed. Abstracts already in `checkpoint`
+    are skipped, and every batch is recorded in it before it is yielded.
+    """
+    done = checkpoint.done if checkpoint is not None else {}
+    todo = [i for i, entry in enumerate(entries) if entry["id"] not in done]
+    prompts = [prompt_template.format(abstract=entries[i]["abstract"].strip()) for i in todo]
+    for batch in generator.generate_batches(prompts):
+        out = []
+        for j, response in batch:
+            entry = entries[todo[j]]
+            if response is None:
+                out.append((todo[j], None))  # failed: not checkpointed, retried on resume
+                continue
+            rows = [{"url": entry.get("url", ""), "research_question": line}
+                    for line in clean_rq_lines(response, number_re)]
+            if checkpoint is not None:
+                checkpoint.record(entry["id"], rows)
+            out.append((todo[j], rows))
+        if checkpoint is not None:
+            checkpoint.sync()
+        yield out
+
+
+def generate_rqs(generator: BatchedGenerator, entries: List[dict], prompt_template: str,
+                 number_re: str,
+                 checkpoint: Checkpoint | None = None,
+                 representative: List[int] | None = None) -> Tuple[List[dict], Dict[str, float]]:
+    """
+    RQ rows ({"url", "research_question"}) for `entries`, in entry order,
+    plus throughput stats of the run ("abstracts" counts model generations
+    only; responses served by a CachedGenerator are counted as "cached" and
+    left out of the throughput). With a checkpoint, abstracts it already
+    holds are not generated again and every finished batch is recorded in it.
+    With `representative` (entry position -> position of its near-duplicate
+    cluster's representative, see Dedup.py), only representatives are
+    generated and every other entry gets its representative's RQs under its
+    own url.
+    """
+    if representative is None:
+        representative = list(range(len(entries)))
+    positions = [i for i, rep in enumerate(representative) if rep == i]
+    done = checkpoint.done if checkpoint is not None else {}
+    resumed = sum(entries[i]["id"] in done for i in positions)
+    results: Dict[int, List[dict] | None] = {}
+    hits_before = getattr(generator, "cache_hits", 0)
+    start = time.perf_counter()
+    for batch in stream_rqs(generator, [entries[i] for i in positions], prompt_template, number_re,
+                            checkpoint):
+        results.update((positions[j], rows) for j, rows in batch)
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for i, entry in enumerate(entries):
+        rep = representative[i]
+        entry_rows = done.get(entries[rep]["id"]) or results.get(rep) or []
+        if rep != i:
+            entry_rows = [{**row, "url": entry.get("url", "")} for row in entry_rows]
+        rows.extend(entry_rows)
+    cached = getattr(generator, "cache_hits", 0) - hits_before
+    generated = len(positions) - resumed - cached
+    stats = {
+        "abstracts": generated,
+        "cached": cached,
+        "resumed": resumed,
+        "duplicates": len(entries) - len(positions),
+        "seconds": elapsed,
+        "abstracts_per_sec": generated / elapsed if elapsed else 0.0,
+        "tokens_per_sec": generator.generated_tokens / elapsed if elapsed else 0.0,
+    }
+    return rows, stats
@@ -0,0 +1,100 @@
+# Opt-in on-disk cache of LLM responses for prompt iteration runs.
+# Entries are keyed by a hash of the model name, the generation parameters and
+# the fully formatted prompt, so re-running an experiment only generates the
+# prompts that changed.
+# RTSREC001 - Rector Ratsaka
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """
+    Directory of JSONL segments, one per batch of new responses, each line
+    {"key", "response"}. All entries are indexed when the cache is opened.
+    Reading from a segment touches its mtime, and once the cache grows past
+    `max_bytes` the least recently used segments are deleted.
+    """
+
+    def __init__(self, cache_dir: str | Path, settings: dict,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._salt = json.dumps(settings, sort_keys=True) + "\0"
+        self._index = {}      # key -> (segment name, response)
+        self._touched = set()
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+        self.evicted = 0
+        self.size = 0
+
+        for segment in self.cache_dir.glob("*.jsonl"):
+            self.size += segment.stat().st_size
+            with open(segment, encoding="utf-8") as fh:
+                for line in fh:
+                    entry = json.loads(line)
+                    self._index[entry["key"]] = (segment.stem, entry["response"])
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.sha1((self._salt + prompt).encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> str | None:
+        """Return the cached response for `prompt`, or None."""
+        entry = self._index.get(self._key(prompt))
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] not in self._touched:
+            self._touched.add(entry[0])
+            try:
+                os.utime(self.cache_dir / (entry[0] + ".jsonl"))
+            except FileNotFoundError:  # evicted by another run meanwhile
+                pass
+        self.hits += 1
+        return entry[1]
+
+    def put_many(self, prompts: list[str], responses: list[str]) -> None:
+        """Store `responses` (for `prompts`, same order) as a new segment."""
+        if not prompts:
+            return
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self.written}"
+        segment = self.cache_dir / (name + ".jsonl")
+        keys = [self._key(p) for p in prompts]
+        tmp = segment.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            for key, response in zip(keys, responses):
+                fh.write(json.dumps({"key": key, "response": response}) + "\n")
+        os.replace(tmp, segment)  # a segment only becomes visible once complete
+
+        for key, response in zip(keys, responses):
+            self._index[key] = (name, response)
+        self._touched.add(name)
+        self.written += len(prompts)
+        self.size += segment.stat().st_size
+
+    def evict(self) -> None:
+        """Delete least recently used segments until the cache fits `max_bytes`."""
+        if self.size <= self.max_bytes:
+            return
+        segments = sorted((p.stat().st_mtime, p.stat().st_size, p)
+                          for p in self.cache_dir.glob("*.jsonl"))
+        self.size = sum(size for _, size, _ in segments)
+        for _, size, path in segments:
+            if self.size <= self.max_bytes:
+                break
+            path.unlink()
+            self._index = {k: v for k, v in self._index.items() if v[0] != path.stem}
+            self.size -= size
+            self.evicted += 1
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100.0) if total else 0.0
+        return (f"response cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+                f"{self.written} written, {self.evicted} segments evicted, "
+                f"{self.size / (1024 * 1024):.1f} MB in {self.cache_dir}")
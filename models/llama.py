@@ -1,19 +1,43 @@
 # Script to generate/extract research questions from abstracts using LLaMA 3.2
-# Usage: python3 llama.py <input_file> <prompts_file> <output_file>
+# Usage: python3 llama.py <input_file> <prompts_file> <output_file> [--batch-size N] [--max-batch-tokens N] [--resume] [--prefix-cache] [--response-cache DIR] [--dedup]
 # RTSREC001 - Rector Ratsaka
 
 import argparse
-import json
 import csv
-import re
-import torch
-from transformers import AutoTokenizer, pipeline
+
+from Generation import (BatchedGenerator, CachedGenerator, Checkpoint, StubGenerator, generate_rqs,
+                        generation_settings, load_model, prompt_settings, read_abstracts, select_abstracts,
+                        template_prefix)
+from Dedup import dedup_entries, dedup_report, write_clusters
+from ResponseCache import ResponseCache
 
 # command line args
 parser = argparse.ArgumentParser(description="Generate/Extract research questions from abstracts using LLaMA 3.2.")
-parser.add_argument("input_file", type=str, help="Path to the input abstracts JSON file.")
+parser.add_argument("input_file", type=str, help="Path to the input abstracts JSON file (or .jsonl abstract store).")
 parser.add_argument("prompts_file", type=str, help="Path to the prompts text file.")
 parser.add_argument("output_file", type=str,  help="Path to the output CSV file.")
+parser.add_argument("--model", type=str, default="meta-llama/Llama-3.2-3B-Instruct",
+                    help="Model name or local path (e.g. a tiny test model).")
+parser.add_argument("--dtype", type=str, default="bfloat16", help="torch dtype of the model weights.")
+parser.add_argument("--batch-size", type=int, default=8, help="Max abstracts per generation batch (1 = one at a time).")
+parser.add_argument("--max-batch-tokens", type=int, default=32768,
+                    help="Token budget per batch: size x (longest prompt + max new tokens).")
+parser.add_argument("--max-new-tokens", type=int, default=256, help="Tokens generated per abstract.")
+parser.add_argument("--checkpoint", type=str, default=None,
+                    help="Progress file of finished abstracts (default: <output_file>.progress.jsonl).")
+parser.add_argument("--resume", action="store_true", help="Skip abstracts already in the checkpoint.")
+parser.add_argument("--response-cache", type=str, default=None,
+                    help="Directory for cached responses, keyed by model, generation params and prompt (opt-in).")
+parser.add_argument("--response-cache-max-mb", type=int, default=256, help="Size limit of the response cache in MB.")
+parser.add_argument("--stub", action="store_true", help="Use a stub generator instead of the model (testing).")
+parser.add_argument("--prefix-cache", action="store_true",
+                    help="Prefill the prompt text before {abstract} once and reuse its key/values.")
+parser.add_argument("--dedup", action="store_true",
+                    help="Generate only one abstract per cluster of near-duplicates (MinHash/LSH); the others reuse its RQs.")
+parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                    help="Jaccard similarity of word 3-gram shingles above which abstracts are near-duplicates.")
+parser.add_argument("--dedup-report", type=str, default=None,
+                    help="Write every skipped duplicate with its representative to this CSV.")
 args = parser.parse_args()
 
 # Assign command line arguments to variables
@@ -22,59 +46,67 @@ prompts_file = args.prompts_file
 output_file = args.output_file
 
 # Model name
-model_name = "meta-llama/Llama-3.2-3B-Instruct"
+model_name = args.model
 
 # Target ID range
 target_ids = set(range(1, 2501))
 
-# Load tokenizer and model
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-pipe = pipeline(
-    "text-generation",
-    model=model_name,
-    tokenizer=tokenizer,
-    torch_dtype=torch.bfloat16,
-    device_map="auto",
-    pad_token_id=tokenizer.eos_token_id
-)
-
-# Load abstracts
-with open(input_file, "r", encoding="utf-8") as f:
-    abstracts = json.load(f)
-
 # Load prompt template
 with open(prompts_file, "r", encoding="utf-8") as f:
     prompt_template = f.read().strip()
 
-# Process and collect research questions
-rqs_dataset = []
-for entry in abstracts:
-    if entry["id"] not in target_ids or not entry.get("abstract", "").strip():
-        continue
-
-    abstract = entry["abstract"].strip()
-    url = entry.get("url", "")
+# Load tokenizer and model
+if args.stub:
+    model_name = "stub"
+    generator = StubGenerator(max_batch_size=args.batch_size)
+else:
+    tokenizer, model = load_model(model_name, args.dtype)
+    generator = BatchedGenerator(tokenizer, model,
+                                 max_new_tokens=args.max_new_tokens,
+                                 max_batch_size=args.batch_size,
+                                 max_batch_tokens=args.max_batch_tokens,
+                                 prefix=template_prefix(prompt_template) if args.prefix_cache else None)
 
-    # format the prompt
-    prompt = prompt_template.format(abstract=abstract)
+# Optional response cache: only prompts not generated before reach the model
+cache = None
+if args.response_cache:
+    cache = ResponseCache(args.response_cache,
+                          generation_settings(model_name, None if args.stub else model,
+                                              max_new_tokens=args.max_new_tokens, dtype=args.dtype),
+                          max_bytes=args.response_cache_max_mb * 1024 * 1024)
+    generator = CachedGenerator(generator, cache)
 
-    # Generate output
-    output = pipe(prompt, max_new_tokens=256)[0]["generated_text"]
-    response = output[len(prompt):].strip()
+# Load abstracts (a .jsonl abstract store is read through its index, target ids only)
+abstracts = read_abstracts(input_file, target_ids)
 
-    for line in response.split("\n"):
-        # Clean and validate each line
-        clean_line = re.sub(r'^\s*["\']?\d+[\.\)]\s*', '', line).strip(' "\'\n')
-        if clean_line:
-            rqs_dataset.append({
-                "url": url,
-                "research_question": clean_line
-            })
+# Process and collect research questions (batched, rows keep abstract order);
+# finished abstracts go to the checkpoint after every batch
+entries = select_abstracts(abstracts, target_ids)
+representative = None
+if args.dedup:
+    representative, dedup_summary = dedup_entries(entries, args.dedup_threshold)
+    print(dedup_report(dedup_summary))
+    if args.dedup_report:
+        write_clusters(args.dedup_report, entries, representative)
+checkpoint = Checkpoint(args.checkpoint or output_file + ".progress.jsonl",
+                        prompt_settings(model_name, prompt_template, args.max_new_tokens),
+                        resume=args.resume)
+rqs_dataset, stats = generate_rqs(generator, entries, prompt_template, checkpoint=checkpoint,
+                                  number_re=r'^\s*["\']?\d+[\.\)]\s*',
+                                  representative=representative)
 
 # Save to CSV
 with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
     writer = csv.DictWriter(csvfile, fieldnames=["url", "research_question"])
     writer.writeheader()
     writer.writerows(rqs_dataset)
+checkpoint.close()
 
-print(f"Total RQs extracted: {len(rqs_dataset)}")
\ No newline at end of file
+print(f"Total RQs extracted: {len(rqs_dataset)}")
+print(f"Abstracts generated: {stats['abstracts']} by the model, {stats['cached']} from the response cache "
+      f"({stats['resumed']} resumed from checkpoint, "
+      f"{stats['duplicates']} near-duplicates reused a representative's RQs)")
+if cache is not None:
+    cache.evict()
+    print(cache.report())
+print(f"Model throughput: {stats['abstracts_per_sec']:.2f} abstracts/s, {stats['tokens_per_sec']:.1f} tokens/s")